@@ -1,17 +1,55 @@
 import os
 import json
+import threading
 import boto3
+from botocore.config import Config
 from dotenv import load_dotenv
+from Rag.Week1.async_utils import LLM_WORKERS
+
+load_dotenv()
+
+# One connection per concurrent Bedrock stream (the LLM executor's size)
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", LLM_WORKERS))
+BEDROCK_CONNECT_TIMEOUT = float(os.getenv("BEDROCK_CONNECT_TIMEOUT", 5))
+# Long answers stream for a while; this bounds the gap between two events
+BEDROCK_READ_TIMEOUT = float(os.getenv("BEDROCK_READ_TIMEOUT", 120))
+BEDROCK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", 4))
+# Point at a local stub (e.g. http://localhost:4010) for tests
+BEDROCK_ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL")
+
+_bedrock_client = None
+_bedrock_lock = threading.Lock()
+
+def get_bedrock_client():
+    """Process-wide Bedrock runtime client.
+
+    boto3 clients are thread-safe, so every request shares one client and
+    its pool of kept-alive connections instead of resolving credentials and
+    opening a new TLS connection each time.
+    """
+    global _bedrock_client
+    if _bedrock_client is None:
+        with _bedrock_lock:
+            if _bedrock_client is None:
+                config = Config(
+                    max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+                    tcp_keepalive=True,
+                    connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+                    read_timeout=BEDROCK_READ_TIMEOUT,
+                    retries={"mode": "adaptive", "max_attempts": BEDROCK_MAX_ATTEMPTS},
+                )
+                _bedrock_client = boto3.client(
+                    service_name='bedrock-runtime',
+                    region_name=os.getenv("AWS_REGION", 'us-east-1'),
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    endpoint_url=BEDROCK_ENDPOINT_URL,
+                    config=config,
+                )
+    return _bedrock_client
 
 def initialize_ai():
-    load_dotenv()
-    bedrock = boto3.client(
-        service_name='bedrock-runtime',
-        region_name='us-east-1',  # or your specific region
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    )
-    return bedrock
+    return get_bedrock_client()
 
 def get_prompt(context, conversation_history, query):
   prompt = f"""Based on the following context and conversation history, please provide a relevant and contextual response.
@@ -30,6 +68,7 @@ def get_prompt(context, conversation_history, query):
 
 def generate_response(client, query: str, context: str, conversation_history: str = ""):
     """Generate a streaming response using AWS Bedrock Claude"""
+    client = client or get_bedrock_client()
     prompt = get_prompt(context, conversation_history, query)
     print("--------------------------------",prompt,"--------------------------------")
     body = json.dumps({
@@ -61,8 +100,9 @@ def generate_response(client, query: str, context: str, conversation_history: st
 
 
 
-def contextualize_query(query: str, conversation_history: str, client: any):
+def contextualize_query(query: str, conversation_history: str, client: any = None):
     """Convert follow-up questions into standalone queries"""
+    client = client or get_bedrock_client()
     prompt = f"""\
     Human: Given a chat history and the latest user question
     which might reference context in the chat history, formulate a standalone
@@ -105,3 +145,49 @@ def contextualize_query(query: str, conversation_history: str, client: any):
 
     except Exception as e:
         yield f"Error generating response from Claude: {str(e)}"
+
+
+# Summaries get their own provider instance, so background calls neither share
+# the serving clients nor show up in the latency metrics of user-facing answers
+_summary_provider = None
+_summary_provider_lock = threading.Lock()
+
+# Longest a background summary may take before the extractive fallback is used
+SUMMARY_TIMEOUT_SECONDS = 60
+
+
+def summarize_history(previous_summary: str, messages: list, max_tokens: int = 200, loop=None) -> str:
+    """Fold older conversation turns into the running summary (runs off the request path).
+
+    Called from a worker thread. With `loop`, the server's event loop, the
+    call is scheduled there, where async provider clients live; without
+    it, a throwaway provider runs on a private loop.
+    """
+    import asyncio
+    from Rag.Week1.llm_providers import create_provider
+    global _summary_provider
+
+    transcript = "\n".join(
+        f"{'Human' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}" for msg in messages
+    )
+    prompt = f"""Update the summary of a conversation with the new messages below.
+    Keep names, numbers, policies and open questions the user may refer back to.
+    Answer with the updated summary only, in at most {max_tokens // 2} words.
+
+    Current summary:
+    {previous_summary or "(none)"}
+
+    New messages:
+    {transcript}"""
+    if loop is None:
+        return asyncio.run(create_provider().generate(prompt, max_tokens=max_tokens)).strip()
+    if _summary_provider is None:
+        with _summary_provider_lock:
+            if _summary_provider is None:
+                _summary_provider = create_provider()
+    future = asyncio.run_coroutine_threadsafe(_summary_provider.generate(prompt, max_tokens=max_tokens), loop)
+    try:
+        return future.result(timeout=SUMMARY_TIMEOUT_SECONDS).strip()
+    except BaseException:
+        future.cancel()
+        raise
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Cosine similarity two questions need to share an answer, on top of
+# retrieving exactly the same chunks
+SIMILARITY_THRESHOLD = 0.95
+MAX_ENTRIES = 512
+TTL_SECONDS = 24 * 3600
+
+# Pause between replayed chunks; keeps the stream incremental for clients
+# without adding noticeable latency
+REPLAY_DELAY_SECONDS = 0.005
+
+
+def chunk_fingerprint(results: dict) -> str:
+    """Hash of the retrieved chunk ids together with their current text.
+
+    Hashing the text means an entry stops matching as soon as any of its
+    chunks is re-ingested with different content, even where chunk ids are
+    positional and survive the change.
+    """
+    if not results or not results.get("ids") or not results["ids"][0]:
+        return None
+    documents = results["documents"][0] if results.get("documents") else [""] * len(results["ids"][0])
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk_id, document in sorted(zip(results["ids"][0], documents), key=lambda pair: pair[0]):
+        digest.update(chunk_id.encode("utf-8") + b"\0" + (document or "").encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """Generated answers keyed by retrieved chunk set and question similarity.
+
+    Entries are grouped by chunk fingerprint, so a lookup only compares the
+    question embedding against answers that were generated from exactly the
+    same context. The stored answer keeps the chunks it was streamed in, so
+    a hit replays the same stream.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_entries: int = MAX_ENTRIES,
+                 ttl: float = TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # fingerprint -> list of entries; entry order tracks recency for eviction
+        self.groups = {}
+        self.order = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, embedding, fingerprint: str):
+        """Stored answer chunks for a similar question over the same chunks, or None"""
+        if fingerprint is None:
+            return None
+        query = self._unit(embedding)
+        now = time.monotonic()
+        with self.lock:
+            best, best_similarity = None, self.threshold
+            for entry in self.groups.get(fingerprint, []):
+                if now - entry["stored_at"] > self.ttl:
+                    continue
+                similarity = float(entry["embedding"] @ query)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.order.move_to_end(id(best))
+            return best["chunks"]
+
+    def put(self, embedding, fingerprint: str, chunks: list):
+        if fingerprint is None or not chunks:
+            return
+        now = time.monotonic()
+        entry = {"embedding": self._unit(embedding), "chunks": list(chunks),
+                 "fingerprint": fingerprint, "stored_at": now}
+        with self.lock:
+            group = self.groups.setdefault(fingerprint, [])
+            # Expired entries are never served; drop them so they cannot block the new answer
+            for expired in [existing for existing in group if now - existing["stored_at"] > self.ttl]:
+                del self.order[id(expired)]
+            group[:] = [existing for existing in group if id(existing) in self.order]
+            # Coalesced requests all finish the same generation; keep a single copy
+            if any(float(existing["embedding"] @ entry["embedding"]) >= self.threshold for existing in group):
+                return
+            group.append(entry)
+            self.order[id(entry)] = entry
+            while len(self.order) > self.max_entries:
+                _, evicted = self.order.popitem(last=False)
+                # Compare by identity; entries hold arrays, which == cannot compare
+                group = self.groups[evicted["fingerprint"]]
+                group[:] = [existing for existing in group if existing is not evicted]
+                if not group:
+                    del self.groups[evicted["fingerprint"]]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.order),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+async def replay(chunks: list, delay: float = REPLAY_DELAY_SECONDS):
+    """Stream stored answer chunks the way a live generation would"""
+    for chunk in chunks:
+        yield chunk
+        await asyncio.sleep(delay)
+
+
+answer_cache = AnswerCache()
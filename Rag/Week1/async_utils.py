@@ -0,0 +1,84 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded pools for the blocking parts of a request, so a burst of slow
+# Bedrock streams cannot starve retrieval (or the event loop) of threads
+RETRIEVAL_WORKERS = 8
+LLM_WORKERS = 32
+
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+llm_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+
+# Chunks a producer thread may run ahead of the client it streams to
+MAX_BUFFERED_CHUNKS = 64
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+async def run_blocking(executor, fn, *args, **kwargs):
+    """Run a blocking call on `executor` without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+async def iterate_in_executor(executor, make_iterator, *args, max_buffered: int = MAX_BUFFERED_CHUNKS, **kwargs):
+    """Consume a blocking iterator on `executor` and relay its items as an async generator.
+
+    `make_iterator(*args, **kwargs)` is called on the worker thread, so even
+    the call that opens the stream (e.g. invoke_model_with_response_stream)
+    stays off the event loop. The producer can run at most `max_buffered`
+    items ahead of the consumer; if the consumer stops early (client
+    disconnected) the producer stops at its next item and closes the iterator.
+    """
+    loop = asyncio.get_running_loop()
+    relay = asyncio.Queue()
+    slots = threading.Semaphore(max_buffered)
+    cancelled = threading.Event()
+
+    def deliver(item):
+        try:
+            loop.call_soon_threadsafe(relay.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed; nobody is listening any more
+            cancelled.set()
+
+    def produce():
+        iterator = None
+        try:
+            iterator = make_iterator(*args, **kwargs)
+            for item in iterator:
+                slots.acquire()
+                if cancelled.is_set():
+                    break
+                deliver(item)
+        except Exception as e:
+            deliver(_Failure(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            deliver(_DONE)
+
+    producer = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await relay.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            slots.release()
+            yield item
+    finally:
+        cancelled.set()
+        # Wake the producer in case it is waiting for a free slot
+        slots.release()
+        if not producer.done():
+            producer.add_done_callback(lambda future: future.exception())
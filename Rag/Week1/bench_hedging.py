@@ -0,0 +1,78 @@
+"""Tail latency of hedged generation, in process with fake providers.
+
+Usage:
+    python bench_hedging.py [--requests 200] [--spike-rate 0.1] [--spike-ttft 3.0] [--deadline-ms 0]
+
+The primary answers in 0.2s except for --spike-rate of calls, which stall for
+--spike-ttft before the first token; one in twenty fails outright. The
+secondary is slower but steady (0.5s). Prints time to first token for the
+primary alone and for the hedged router. With hedging, p99 should drop to
+about the deadline plus the secondary's time to first token. A deadline of 0
+lets the router adapt it from the primary's observed latency.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from Rag.Week1.llm_providers import FakeProvider
+from Rag.Week1.llm_router import HedgedProvider
+
+
+async def time_to_first_token(provider, prompt: str) -> float:
+    start = time.perf_counter()
+    try:
+        async for _ in provider.stream(prompt, max_tokens=20):
+            return time.perf_counter() - start
+    except Exception:
+        pass
+    return None
+
+
+async def run(provider, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            return await time_to_first_token(provider, f"question {i}")
+
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    ok = sorted(r for r in results if r is not None)
+    return {
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "p50": statistics.median(ok) if ok else 0.0,
+        "p95": ok[int(0.95 * (len(ok) - 1))] if ok else 0.0,
+        "p99": ok[int(0.99 * (len(ok) - 1))] if ok else 0.0,
+    }
+
+
+def primary(args) -> FakeProvider:
+    return FakeProvider("primary", ttft=0.2, tokens_per_second=200, fail_rate=0.05,
+                        spike_rate=args.spike_rate, spike_ttft=args.spike_ttft)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Hedged generation benchmark")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--spike-rate", type=float, default=0.1)
+    parser.add_argument("--spike-ttft", type=float, default=3.0)
+    parser.add_argument("--deadline-ms", type=float, default=0, help="fixed hedge deadline; 0 adapts it")
+    args = parser.parse_args()
+
+    alone = await run(primary(args), args.requests, args.concurrency)
+    router = HedgedProvider(primary(args), FakeProvider("secondary", ttft=0.5, tokens_per_second=100),
+                            deadline=args.deadline_ms / 1000 if args.deadline_ms else None)
+    hedged = await run(router, args.requests, args.concurrency)
+
+    print(f"{'':>8} {'ok':>4} {'err':>4} {'ttft p50':>9} {'ttft p95':>9} {'ttft p99':>9}")
+    for label, r in (("primary", alone), ("hedged", hedged)):
+        print(f"{label:>8} {r['ok']:>4} {r['errors']:>4} {r['p50']:>8.2f}s {r['p95']:>8.2f}s {r['p99']:>8.2f}s")
+    stats = router.stats()
+    print(f"Hedged {stats['hedged']}, fell back {stats['fallbacks']} of {stats['requests']} requests; "
+          f"secondary won {stats['secondary_wins']}; deadline now {stats['deadline_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
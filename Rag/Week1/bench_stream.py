@@ -0,0 +1,85 @@
+"""Concurrency benchmark for the /stream endpoint.
+
+Usage:
+    python bench_stream.py [--url http://localhost:8000/stream] [--levels 1,2,4,8,16] [--requests 32]
+
+For each concurrency level the same number of requests is sent by that many
+simultaneous users. With a non-blocking /stream, requests/s should grow with
+the level instead of staying flat, and time to first byte should stay close
+to the single-user value.
+
+Start the server with LLM_PROVIDER=fake to load test the serving stack
+without calling Bedrock.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PROMPTS = [
+    "What is the leave policy?",
+    "How many sick days do employees get?",
+    "What is the notice period?",
+    "How do I claim travel expenses?",
+]
+
+
+async def one_request(client, url: str, prompt: str) -> tuple:
+    """Stream one response, returning (time to first byte, total time, bytes)"""
+    start = time.perf_counter()
+    first_byte = None
+    received = 0
+    async with client.stream("GET", url, params={"prompt": prompt}) as response:
+        async for chunk in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            received += len(chunk)
+    total = time.perf_counter() - start
+    return first_byte if first_byte is not None else total, total, received
+
+
+async def run_level(url: str, concurrency: int, requests: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        async def user(i: int):
+            async with semaphore:
+                return await one_request(client, url, DEFAULT_PROMPTS[i % len(DEFAULT_PROMPTS)])
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(user(i) for i in range(requests)), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if not isinstance(r, Exception)]
+    ttfb = sorted(r[0] for r in ok)
+    totals = sorted(r[1] for r in ok)
+    return {
+        "concurrency": concurrency,
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "requests/s": len(ok) / elapsed if elapsed else 0.0,
+        "ttfb_p50": statistics.median(ttfb) if ttfb else 0.0,
+        "ttfb_p95": ttfb[int(0.95 * (len(ttfb) - 1))] if ttfb else 0.0,
+        "latency_p50": statistics.median(totals) if totals else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrency benchmark for /stream")
+    parser.add_argument("--url", default="http://localhost:8000/stream")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per level")
+    args = parser.parse_args()
+
+    print(f"{'users':>5} {'ok':>4} {'err':>4} {'req/s':>7} {'ttfb p50':>9} {'ttfb p95':>9} {'total p50':>10}")
+    for level in (int(value) for value in args.levels.split(",")):
+        r = await run_level(args.url, level, args.requests)
+        print(f"{r['concurrency']:>5} {r['ok']:>4} {r['errors']:>4} {r['requests/s']:>7.2f} "
+              f"{r['ttfb_p50']:>8.2f}s {r['ttfb_p95']:>8.2f}s {r['latency_p50']:>9.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
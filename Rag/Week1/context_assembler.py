@@ -0,0 +1,91 @@
+# Token budget for the document context of one prompt. Tokens are estimated
+# at ~4 characters each, close enough for English text with Claude's tokenizer
+CONTEXT_TOKEN_BUDGET = 1500
+CHARS_PER_TOKEN = 4
+
+# split_text overlaps chunks by 200 characters; look a little further in case
+# stripping whitespace shifted the boundary, and ignore accidental short matches
+MAX_OVERLAP_CHARS = 300
+MIN_OVERLAP_CHARS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def overlap_length(previous: str, following: str, max_chars: int = MAX_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of `previous` that `following` starts with"""
+    for length in range(min(max_chars, len(previous), len(following)), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:length]):
+            return length
+    return 0
+
+
+def merge_chunks(hits: list) -> list:
+    """Merge hits from consecutive chunks of the same source into segments.
+
+    `hits` are (rank, text, metadata) tuples. Each segment keeps the best
+    (lowest) rank of the chunks it absorbed, its source and its chunk range,
+    and the text with the duplicated overlap removed.
+    """
+    by_source = {}
+    for rank, text, metadata in hits:
+        by_source.setdefault(metadata.get("source", ""), {}).setdefault(metadata.get("chunk", rank), (rank, text))
+
+    segments = []
+    for source, chunks in by_source.items():
+        current = None
+        for chunk in sorted(chunks):
+            rank, text = chunks[chunk]
+            if current is not None and chunk == current["last"] + 1:
+                overlap = overlap_length(current["text"], text)
+                current["text"] += text[overlap:] if overlap else "\n" + text
+                current["last"] = chunk
+                current["rank"] = min(current["rank"], rank)
+                continue
+            current = {"source": source, "first": chunk, "last": chunk, "rank": rank, "text": text}
+            segments.append(current)
+    return segments
+
+
+def pack_segments(segments: list, max_tokens: int = CONTEXT_TOKEN_BUDGET) -> list:
+    """Most relevant segments that fit the budget, back in document order.
+
+    If even the most relevant segment exceeds the budget it is truncated
+    rather than dropped, so the prompt never ends up without context.
+    """
+    packed, used = [], 0
+    for segment in sorted(segments, key=lambda segment: segment["rank"]):
+        tokens = estimate_tokens(segment["text"])
+        if used + tokens <= max_tokens:
+            packed.append(segment)
+            used += tokens
+        elif not packed:
+            packed.append({**segment, "text": segment["text"][:max_tokens * CHARS_PER_TOKEN]})
+            used = max_tokens
+
+    # Sources appear in order of their best segment, and each source's segments in chunk order
+    source_rank = {}
+    for segment in packed:
+        source_rank[segment["source"]] = min(source_rank.get(segment["source"], segment["rank"]), segment["rank"])
+    return sorted(packed, key=lambda segment: (source_rank[segment["source"]], segment["source"], segment["first"]))
+
+
+def assemble_context(results: dict, max_tokens: int = CONTEXT_TOKEN_BUDGET):
+    """Build the prompt context and source labels from a Chroma-shaped search result"""
+    documents = results["documents"][0]
+    metadatas = results["metadatas"][0] if results.get("metadatas") and results["metadatas"][0] else \
+        [{} for _ in documents]
+
+    segments = pack_segments(
+        merge_chunks([(rank, text, metadata or {}) for rank, (text, metadata) in enumerate(zip(documents, metadatas))]),
+        max_tokens,
+    )
+
+    context = "\n\n".join(segment["text"] for segment in segments)
+    sources = [
+        f"{segment['source']} (chunk {segment['first']})" if segment["first"] == segment["last"]
+        else f"{segment['source']} (chunks {segment['first']}-{segment['last']})"
+        for segment in segments
+    ]
+    return context, sources
@@ -0,0 +1,56 @@
+import threading
+
+from Rag.Week1.initializedb import current_generation
+from Rag.Week4.rag_initialization.bm25_index import load_bm25_index, rebuild_bm25_index, hybrid_results
+from Rag.Week4.rag_initialization.batch_search import batch_query, normalize_requests
+
+# Snapshot of the lexical index, next to chroma_db like the generation file
+BM25_INDEX_PATH = "chroma_db_bm25.pkl"
+
+# Candidates taken from each retriever before fusion
+CANDIDATES = 20
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_bm25_index(collection):
+    """The shared BM25 index, reloaded (or rebuilt) when the ingestion generation moves"""
+    global _index
+    generation = current_generation()
+    if _index is None or _index.generation != generation:
+        with _lock:
+            if _index is None or _index.generation != generation:
+                _index = load_bm25_index(collection, BM25_INDEX_PATH, generation)
+    return _index
+
+
+def refresh_bm25_index(collection):
+    """Rebuild the snapshot after ingestion so the first query does not pay for it"""
+    return rebuild_bm25_index(collection, BM25_INDEX_PATH, current_generation())
+
+
+def hybrid_search(collection, query: str, vector_search, k: int = 5, candidates: int = CANDIDATES):
+    """Top `k` chunks by reciprocal rank fusion of vector and BM25 rankings.
+
+    `vector_search(collection, query, n)` returns a Chroma query result, so
+    the cached search can be plugged in.
+    """
+    vector_results = vector_search(collection, query, candidates)
+    lexical = get_bm25_index(collection).search(query, candidates)
+    return hybrid_results(collection, vector_results, lexical, k)
+
+
+def batch_hybrid_search(collection, queries: list, embed, default_k: int = 5, candidates: int = CANDIDATES) -> list:
+    """hybrid_search for many queries, sharing one embedding pass and one vector query per filter"""
+    requests = normalize_requests(queries, default_k)
+    vector_results = batch_query(collection, requests, embed=embed, n_results=lambda k: max(k, candidates))
+    index = get_bm25_index(collection)
+    # Filtered queries only fuse lexical hits that also passed the filter in the vector results
+    return [
+        hybrid_results(collection, results, [
+            hit for hit in index.search(request["query"], candidates)
+            if request["where"] is None or hit[0] in results["ids"][0]
+        ], request["k"])
+        for request, results in zip(requests, vector_results)
+    ]
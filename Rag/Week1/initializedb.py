@@ -1,14 +1,43 @@
+import os
 import chromadb
 from chromadb.utils import embedding_functions
+from Rag.Week4.rag_initialization.embedding_cache import CachedEmbeddingFunction
+from Rag.Week4.rag_initialization.vector_index import MemmapCollection
+
+CHROMA_DB_PATH = "chroma_db"
+
+# "chroma" (default) or "memmap" for the quantized memory-mapped index
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_PATH = "vector_index"
+VECTOR_QUANTIZATION = os.getenv("RAG_VECTOR_QUANTIZATION", "int8")
+
+# Bumped on every write to the collection; query caches compare against it
+GENERATION_PATH = "chroma_db_generation"
+
+_embedding_function = None
+
+def get_embedding_function():
+    """Return the process-wide embedding function, consulting the shared embedding cache first"""
+    global _embedding_function
+    if _embedding_function is None:
+        _embedding_function = CachedEmbeddingFunction(
+            embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2"),
+            "all-MiniLM-L6-v2",
+        )
+    return _embedding_function
+
+def initialize_db(backend: str = None):
+    backend = backend or VECTOR_BACKEND
+    if backend == "memmap":
+        return MemmapCollection(VECTOR_INDEX_PATH, get_embedding_function(), VECTOR_QUANTIZATION)
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector backend: {backend}")
 
-def initialize_db():
     # Initialize ChromaDB client with persistence
-    client = chromadb.PersistentClient(path="chroma_db")
+    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
 
     # Configure sentence transformer embeddings
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="all-MiniLM-L6-v2"
-    )
+    sentence_transformer_ef = get_embedding_function()
 
     # Create or get existing collection
     collection = client.get_or_create_collection(
@@ -31,3 +60,31 @@ def add_to_collection(collection, ids, texts, metadatas):
             metadatas=metadatas[i:end_idx],
             ids=ids[i:end_idx]
         )
+    bump_generation()
+
+
+def bump_generation():
+    """Advance the ingestion generation so query-side caches drop their entries"""
+    generation = current_generation() + 1
+    tmp_path = f"{GENERATION_PATH}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.write(str(generation))
+    os.replace(tmp_path, GENERATION_PATH)
+    return generation
+
+
+_generation_cache = (None, 0)
+
+def current_generation() -> int:
+    """Current ingestion generation; re-read only when the file changes"""
+    global _generation_cache
+    try:
+        stat = os.stat(GENERATION_PATH)
+    except FileNotFoundError:
+        return 0
+    # bump_generation replaces the file, so the inode changes on every bump
+    version = (stat.st_ino, stat.st_mtime_ns)
+    if _generation_cache[0] != version:
+        with open(GENERATION_PATH) as file:
+            _generation_cache = (version, int(file.read().strip() or 0))
+    return _generation_cache[1]
@@ -0,0 +1,327 @@
+import abc
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from Rag.Week1.async_utils import iterate_in_executor, llm_executor
+
+# Calls kept per provider for the latency summary
+METRICS_WINDOW = 500
+
+# Used when a backend does not report token usage
+CHARS_PER_TOKEN = 4
+
+SYSTEM_PROMPT = "You are a helpful assistant that answers questions based on the provided context."
+
+
+class Usage:
+    """Output token count reported by a backend at the end of a stream"""
+
+    def __init__(self, output_tokens: int):
+        self.output_tokens = output_tokens
+
+
+class CallMetrics:
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.start = time.perf_counter()
+        self.ttft = None
+        self.total = None
+        self.tokens = 0
+        self.chars = 0
+        self.error = None
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Decode speed: tokens after the first one over the time after the first one"""
+        if self.total is None or self.ttft is None or self.total <= self.ttft:
+            return 0.0
+        return max(self.tokens - 1, 0) / (self.total - self.ttft)
+
+    def as_dict(self) -> dict:
+        return {
+            "provider": self.provider, "model": self.model,
+            "ttft_ms": self.ttft * 1000 if self.ttft is not None else None,
+            "total_ms": self.total * 1000 if self.total is not None else None,
+            "tokens": self.tokens, "tokens_per_second": self.tokens_per_second, "error": self.error,
+        }
+
+
+def _percentile(values: list, percent: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+
+class ProviderMetrics:
+    """Rolling window of recent calls of one provider"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.calls = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, call: CallMetrics):
+        with self.lock:
+            self.calls.append(call)
+
+    def summary(self) -> dict:
+        with self.lock:
+            calls = list(self.calls)
+        ok = [call for call in calls if call.error is None and call.total is not None]
+        ttfts = [call.ttft * 1000 for call in ok if call.ttft is not None]
+        totals = [call.total * 1000 for call in ok]
+        rates = [call.tokens_per_second for call in ok if call.tokens_per_second]
+        return {
+            "calls": len(calls),
+            "errors": len(calls) - len(ok),
+            "ttft_p50_ms": _percentile(ttfts, 50), "ttft_p95_ms": _percentile(ttfts, 95),
+            "total_p50_ms": _percentile(totals, 50), "total_p95_ms": _percentile(totals, 95),
+            "tokens_per_second": sum(rates) / len(rates) if rates else None,
+        }
+
+
+class LLMProvider(abc.ABC):
+    """Async streaming text generation with per-call metrics.
+
+    Subclasses implement `_stream`, an async generator of text chunks that
+    may end with a Usage; `stream` times the call (time to first token,
+    tokens/sec, total latency) and records it in `metrics`.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+        self.metrics = ProviderMetrics()
+        self.last_call = None
+
+    @abc.abstractmethod
+    def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        """Async generator of text chunks, optionally ending with a Usage"""
+
+    async def stream(self, prompt: str, max_tokens: int = 500, temperature: float = 0.1):
+        call = CallMetrics(self.name, self.model)
+        reported_tokens = None
+        try:
+            async for item in self._stream(prompt, max_tokens, temperature):
+                if isinstance(item, Usage):
+                    reported_tokens = item.output_tokens
+                    continue
+                if not item:
+                    continue
+                if call.ttft is None:
+                    call.ttft = time.perf_counter() - call.start
+                call.chars += len(item)
+                yield item
+        except (GeneratorExit, asyncio.CancelledError):
+            # The consumer stopped reading, e.g. the client disconnected
+            call.error = "cancelled"
+            raise
+        except Exception as e:
+            call.error = str(e) or type(e).__name__
+            raise
+        finally:
+            call.total = time.perf_counter() - call.start
+            call.tokens = reported_tokens if reported_tokens is not None else \
+                (call.chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+            self.last_call = call
+            self.metrics.record(call)
+
+    async def generate(self, prompt: str, max_tokens: int = 500, temperature: float = 0.1) -> str:
+        return "".join([chunk async for chunk in self.stream(prompt, max_tokens, temperature)])
+
+
+class BedrockProvider(LLMProvider):
+    """Claude text completions on Bedrock.
+
+    boto3 has no async client, so the event stream is consumed on the LLM
+    executor and relayed; the shared, pooled client from ai_client is used.
+    """
+
+    name = "bedrock"
+
+    def __init__(self, model: str = "anthropic.claude-v2", client=None):
+        super().__init__(model)
+        self.client = client
+
+    def _events(self, prompt: str, max_tokens: int, temperature: float):
+        from Rag.Week1.ai_client import get_bedrock_client
+        body = json.dumps({
+            "prompt": f"\n\nHuman: {SYSTEM_PROMPT}\n\n{prompt}\n\nAssistant:",
+            "max_tokens_to_sample": max_tokens,
+            "temperature": temperature,
+            "top_k": 50,
+            "top_p": 0.7,
+            "stop_sequences": ["\n\nHuman:"]
+        })
+        response = (self.client or get_bedrock_client()).invoke_model_with_response_stream(
+            body=body, modelId=self.model, accept="application/json", contentType="application/json"
+        )
+        for event in response["body"]:
+            chunk = json.loads(event["chunk"]["bytes"])
+            if chunk.get("completion"):
+                yield chunk["completion"]
+            invocation = chunk.get("amazon-bedrock-invocationMetrics")
+            if invocation and "outputTokenCount" in invocation:
+                yield Usage(invocation["outputTokenCount"])
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        async for item in iterate_in_executor(llm_executor, self._events, prompt, max_tokens, temperature):
+            yield item
+
+
+class GroqProvider(LLMProvider):
+    """Groq (or any OpenAI-compatible endpoint) through the native AsyncOpenAI client"""
+
+    name = "groq"
+
+    def __init__(self, model: str = "llama-3.1-8b-instant", base_url: str = "https://api.groq.com/openai/v1",
+                 api_key: str = None):
+        super().__init__(model)
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key or os.getenv("GROG_API_KEY"))
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None) is not None:
+                yield Usage(chunk.usage.completion_tokens)
+
+
+class OllamaProvider(LLMProvider):
+    """Local models through ollama.AsyncClient"""
+
+    name = "ollama"
+
+    def __init__(self, model: str = "Jarvis", host: str = "127.0.0.1:11434", keep_alive=None):
+        super().__init__(model)
+        import ollama
+        self.client = ollama.AsyncClient(host)
+        self.keep_alive = keep_alive
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        response = await self.client.generate(
+            self.model, prompt, system=SYSTEM_PROMPT, stream=True, keep_alive=self.keep_alive,
+            options={"num_predict": max_tokens, "temperature": temperature},
+        )
+        async for chunk in response:
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done") and chunk.get("eval_count") is not None:
+                yield Usage(chunk["eval_count"])
+
+
+class ChatBedrockProvider(LLMProvider):
+    """Bedrock chat models through langchain_aws.ChatBedrock's native astream.
+
+    The model defaults to CHAT_BEDROCK_MODEL_ID, else a Claude 3.5 Haiku
+    cross-region inference profile.
+    """
+
+    name = "chat-bedrock"
+
+    def __init__(self, model: str = None, region_name: str = "us-east-1", credentials_profile_name: str = None,
+                 provider: str = "anthropic"):
+        model = model or os.getenv("CHAT_BEDROCK_MODEL_ID", "us.anthropic.claude-3-5-haiku-20241022-v1:0")
+        super().__init__(model)
+        from langchain_aws import ChatBedrock
+        self.llm = ChatBedrock(
+            model_id=model, provider=provider, region_name=region_name,
+            credentials_profile_name=credentials_profile_name,
+        )
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        llm = self.llm.bind(max_tokens=max_tokens, temperature=temperature)
+        async for chunk in llm.astream([("system", SYSTEM_PROMPT), ("human", prompt)]):
+            if chunk.content:
+                yield chunk.content if isinstance(chunk.content, str) else "".join(
+                    part.get("text", "") for part in chunk.content if isinstance(part, dict))
+            usage = getattr(chunk, "usage_metadata", None)
+            if usage and usage.get("output_tokens"):
+                yield Usage(usage["output_tokens"])
+
+
+class FakeProvider(LLMProvider):
+    """In-process provider for load tests: fixed time to first token and decode speed, no network.
+
+    `spike_rate` of calls wait `spike_ttft` before the first token instead,
+    to simulate a backend with a slow tail.
+    """
+
+    name = "fake"
+
+    def __init__(self, model: str = "fake", text: str = None, ttft: float = 0.3,
+                 tokens_per_second: float = 50.0, fail_rate: float = 0.0,
+                 spike_rate: float = 0.0, spike_ttft: float = 5.0):
+        super().__init__(model)
+        self.text = text or ("This is a simulated answer from the fake provider, streamed word by word "
+                             "so the serving stack can be load tested without any network. ") * 3
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.fail_rate = fail_rate
+        self.spike_rate = spike_rate
+        self.spike_ttft = spike_ttft
+        self.calls = 0
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        self.calls += 1
+        # Deterministic spread of spikes and failures over the calls
+        draw = (self.calls * 0.6180339887) % 1
+        await asyncio.sleep(self.spike_ttft if self.spike_rate and (draw + 0.5) % 1 < self.spike_rate else self.ttft)
+        if self.fail_rate and draw < self.fail_rate:
+            raise RuntimeError("fake provider failure")
+        words = self.text.split(" ")[:max_tokens]
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield word if i == len(words) - 1 else word + " "
+        yield Usage(len(words))
+
+
+PROVIDERS = {
+    "bedrock": BedrockProvider,
+    "groq": GroqProvider,
+    "ollama": OllamaProvider,
+    "chat-bedrock": ChatBedrockProvider,
+    "fake": FakeProvider,
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def create_provider(name: str = None, **options) -> LLMProvider:
+    """New provider instance, with its own client and metrics; LLM_PROVIDER picks the default (bedrock)"""
+    name = name or os.getenv("LLM_PROVIDER", "bedrock")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {name}")
+    return PROVIDERS[name](**options)
+
+
+def get_provider(name: str = None, **options) -> LLMProvider:
+    """Shared provider instance by name; LLM_PROVIDER picks the default (bedrock)"""
+    name = name or os.getenv("LLM_PROVIDER", "bedrock")
+    key = (name, tuple(sorted(options.items())))
+    if key not in _providers:
+        with _providers_lock:
+            if key not in _providers:
+                _providers[key] = create_provider(name, **options)
+    return _providers[key]
+
+
+def provider_stats() -> dict:
+    return {f"{provider.name}:{provider.model}": provider.metrics.summary() for provider in _providers.values()}
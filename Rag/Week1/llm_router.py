@@ -0,0 +1,217 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from Rag.Week1.llm_providers import LLMProvider, get_provider
+
+# Adaptive hedge deadline: this percentile of the primary's recent time to
+# first token, kept between the bounds below
+HEDGE_PERCENTILE = 95
+MIN_HEDGE_DEADLINE_SECONDS = 0.25
+MAX_HEDGE_DEADLINE_SECONDS = 4.0
+# Used until the primary has this many observations
+DEFAULT_HEDGE_DEADLINE_SECONDS = 1.5
+MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Keep a local hedge model loaded so a hedged request does not pay the load time
+HEDGE_KEEP_ALIVE = "30m"
+
+_DONE = object()
+
+
+class LatencyTracker:
+    """Rolling time-to-first-token samples of one provider, in seconds.
+
+    A primary cancelled before its first token because the hedge won is
+    censored: all that is known is that it took longer than the deadline,
+    so the deadline is recorded. Dropping it would hide exactly the slow
+    calls the hedge exists for and pull the deadline down; recording the
+    time until cancellation (deadline plus the secondary's time to first
+    token) would push each next deadline higher than the last.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percent: float):
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class HedgedProvider(LLMProvider):
+    """Stream from a primary provider, hedging to a secondary one when it is slow or failing.
+
+    If the primary has not produced a first token within the deadline, the
+    same prompt is sent to the secondary as well; if the primary fails before
+    its first token, the secondary is started right away. Whichever streams
+    a first token first is relayed to the caller and the other is cancelled.
+    Without a fixed `deadline`, the deadline follows the primary's recent
+    time-to-first-token percentile.
+    """
+
+    name = "hedged"
+
+    def __init__(self, primary: LLMProvider, secondary: LLMProvider, deadline: float = None,
+                 percentile: float = HEDGE_PERCENTILE, min_deadline: float = MIN_HEDGE_DEADLINE_SECONDS,
+                 max_deadline: float = MAX_HEDGE_DEADLINE_SECONDS):
+        super().__init__(f"{primary.name}:{primary.model}|{secondary.name}:{secondary.model}")
+        self.primary = primary
+        self.secondary = secondary
+        self.fixed_deadline = deadline
+        self.percentile = percentile
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.latency = {"primary": LatencyTracker(), "secondary": LatencyTracker()}
+        self.requests = 0
+        self.hedged = 0
+        self.fallbacks = 0
+        self.wins = {"primary": 0, "secondary": 0}
+
+    def deadline(self) -> float:
+        """Seconds to wait for the primary's first token before hedging"""
+        if self.fixed_deadline is not None:
+            return self.fixed_deadline
+        if len(self.latency["primary"]) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DEADLINE_SECONDS
+        observed = self.latency["primary"].percentile(self.percentile)
+        return min(self.max_deadline, max(self.min_deadline, observed))
+
+    async def _leg(self, role: str, provider: LLMProvider, queue: asyncio.Queue, prompt: str,
+                   max_tokens: int, temperature: float, race: dict):
+        """Relay one provider's stream into the shared queue as (role, chunk) pairs.
+
+        `race["deadline"]` is set to the deadline in force once the request is hedged.
+        """
+        start = time.perf_counter()
+        first = True
+        try:
+            async for chunk in provider.stream(prompt, max_tokens, temperature):
+                if first:
+                    self.latency[role].record(time.perf_counter() - start)
+                    first = False
+                queue.put_nowait((role, chunk))
+            queue.put_nowait((role, _DONE))
+        except asyncio.CancelledError:
+            # Cancelled without hedging means the caller went away: no information
+            if first and role == "primary" and race.get("deadline") is not None:
+                self.latency[role].record(race["deadline"])
+            raise
+        except Exception as e:
+            queue.put_nowait((role, e))
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        self.requests += 1
+        queue = asyncio.Queue()
+        race = {}
+        legs = {"primary": asyncio.ensure_future(
+            self._leg("primary", self.primary, queue, prompt, max_tokens, temperature, race))}
+        winner = None
+        errors = {}
+
+        def start_secondary():
+            legs["secondary"] = asyncio.ensure_future(
+                self._leg("secondary", self.secondary, queue, prompt, max_tokens, temperature, race))
+
+        try:
+            # Race until one leg produces its first chunk
+            while winner is None:
+                try:
+                    timeout = self.deadline() if "secondary" not in legs else None
+                    role, item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    race["deadline"] = timeout
+                    self.hedged += 1
+                    start_secondary()
+                    continue
+                if item is _DONE or isinstance(item, Exception):
+                    errors[role] = item if item is not _DONE else RuntimeError(f"{role} returned no output")
+                    if role == "primary" and "secondary" not in legs:
+                        self.fallbacks += 1
+                        start_secondary()
+                    elif len(errors) == len(legs):
+                        raise errors["primary"]
+                    continue
+                winner = role
+                self.wins[role] += 1
+                for role_, leg in legs.items():
+                    if role_ != winner:
+                        leg.cancel()
+                yield item
+
+            # Relay the rest of the winning stream
+            while True:
+                role, item = await queue.get()
+                if role != winner:
+                    continue
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            for leg in legs.values():
+                leg.cancel()
+
+    def stats(self) -> dict:
+        def ms(seconds):
+            return seconds * 1000 if seconds is not None else None
+
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "fallbacks": self.fallbacks,
+            "hedge_ratio": (self.hedged + self.fallbacks) / self.requests if self.requests else 0.0,
+            "primary_wins": self.wins["primary"],
+            "secondary_wins": self.wins["secondary"],
+            "deadline_ms": ms(self.deadline()),
+            "primary_ttft_p50_ms": ms(self.latency["primary"].percentile(50)),
+            "primary_ttft_p95_ms": ms(self.latency["primary"].percentile(95)),
+            "secondary_ttft_p50_ms": ms(self.latency["secondary"].percentile(50)),
+            "secondary_ttft_p95_ms": ms(self.latency["secondary"].percentile(95)),
+        }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_generation_provider() -> LLMProvider:
+    """Provider for answer generation.
+
+    With LLM_HEDGE_PROVIDER set (e.g. ollama), LLM_PROVIDER is hedged to it;
+    LLM_HEDGE_DEADLINE_MS fixes the deadline instead of adapting it.
+    Without it, this is just the LLM_PROVIDER provider.
+    """
+    global _router
+    secondary = os.getenv("LLM_HEDGE_PROVIDER")
+    if not secondary:
+        return get_provider()
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                fixed = os.getenv("LLM_HEDGE_DEADLINE_MS")
+                _router = HedgedProvider(
+                    get_provider(),
+                    get_provider(secondary, keep_alive=HEDGE_KEEP_ALIVE) if secondary == "ollama"
+                    else get_provider(secondary),
+                    deadline=float(fixed) / 1000 if fixed else None,
+                )
+    return _router
+
+
+def router_stats() -> dict:
+    return _router.stats() if _router is not None else {"enabled": False}
@@ -1,13 +1,19 @@
-from processDocs import process_document
+import sys
+from processDocs import process_documents
 from Rag.Week1.initializedb import initialize_db, add_to_collection
+from Rag.Week1.hybrid_search import refresh_bm25_index
 
 def main():
     collection = initialize_db();
     print("Collection initialized")
-    ids, chunks, metadatas = process_document("Employee Handbook 2025.pdf")
-    print("Documents processed")
+    # Files, directories or globs; resumable bulk runs use Rag/Week4/rag_initialization/bulk-ingest.py
+    paths = sys.argv[1:] or ["Employee Handbook 2025.pdf"]
+    ids, chunks, metadatas = process_documents(paths)
+    print(f"Documents processed: {len(chunks)} chunks")
     add_to_collection(collection, ids, chunks, metadatas)
     print("Documents added to collection")
+    index = refresh_bm25_index(collection)
+    print(f"BM25 index rebuilt: {len(index)} chunks")
 
 
 if __name__ == "__main__":
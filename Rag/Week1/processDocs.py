@@ -1,18 +1,25 @@
+from concurrent.futures import ProcessPoolExecutor
 from docx import Document
 import PyPDF2
+import glob
 import os
 
-def read_document(file_path: str) -> str:
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx')
+
+# Number of PDF pages handed to a single worker task
+PAGES_PER_TASK = 25
+
+def read_document(file_path: str, parallel: bool = False, max_workers: int = None) -> str:
     """Read content from a document file"""
     file_extension = os.path.splitext(file_path)[1].lower()
 
+    if parallel and file_extension == '.pdf':
+        # Split the PDF into page ranges and extract them in a process pool
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            return _collect_document(_submit_document(pool, file_path, PAGES_PER_TASK))
+
     if file_extension == '.docx':
-        # Read Word document
-        doc = Document(file_path)
-        content = []
-        for paragraph in doc.paragraphs:
-            content.append(paragraph.text)
-        return '\n'.join(content)
+        return _read_docx(file_path)
 
     elif file_extension == '.pdf':
         # Read PDF document
@@ -26,6 +33,98 @@ def read_document(file_path: str) -> str:
     else:
         raise ValueError(f"Unsupported file format: {file_extension}")
 
+def _read_docx(file_path: str) -> str:
+    """Read a Word document"""
+    doc = Document(file_path)
+    content = []
+    for paragraph in doc.paragraphs:
+        content.append(paragraph.text)
+    return '\n'.join(content)
+
+def _read_pdf_pages(file_path: str, start: int, end: int) -> list:
+    """Extract the text of pages [start, end) of a PDF (runs in a worker process)"""
+    content = []
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_number in range(start, end):
+            content.append(pdf_reader.pages[page_number].extract_text() or "")
+    return content
+
+def _count_pdf_pages(file_path: str) -> int:
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def expand_paths(paths) -> list:
+    """Expand files, directories and glob patterns into a sorted list of supported files"""
+    if isinstance(paths, str):
+        paths = [paths]
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names)
+        elif glob.has_magic(path):
+            files.extend(glob.glob(path, recursive=True))
+        else:
+            files.append(path)
+
+    supported = [f for f in files if os.path.splitext(f)[1].lower() in SUPPORTED_EXTENSIONS]
+    # dict.fromkeys keeps the first occurrence of each file
+    return sorted(dict.fromkeys(supported))
+
+def _submit_document(pool, file_path: str, pages_per_task: int) -> list:
+    """Queue the extraction tasks for one document, one task per PDF page range"""
+    if os.path.splitext(file_path)[1].lower() != '.pdf':
+        return [pool.submit(_read_docx, file_path)]
+
+    page_count = _count_pdf_pages(file_path)
+    return [
+        pool.submit(_read_pdf_pages, file_path, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+def _collect_document(futures: list) -> str:
+    """Join task results in submission order so pages stay in document order"""
+    parts = []
+    for future in futures:
+        result = future.result()
+        if isinstance(result, list):
+            parts.extend(result)
+        else:
+            parts.append(result)
+    return '\n'.join(parts)
+
+def read_documents(paths, max_workers: int = None, pages_per_task: int = PAGES_PER_TASK) -> list:
+    """Read many documents in parallel, returning [(file_path, content), ...] in path order.
+
+    PDFs are split into page ranges of `pages_per_task` pages and every range
+    (and every DOCX file) becomes one task in a shared process pool, so both a
+    single large PDF and a directory of small files keep all cores busy.
+    Files that fail to read are reported and skipped.
+    """
+    files = expand_paths(paths)
+    if not files:
+        return []
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        # Submit everything up front so workers never wait on the next file
+        tasks = []
+        for file_path in files:
+            try:
+                tasks.append((file_path, _submit_document(pool, file_path, pages_per_task)))
+            except Exception as e:
+                print(f"Error reading {file_path}: {str(e)}")
+
+        documents = []
+        for file_path, futures in tasks:
+            try:
+                documents.append((file_path, _collect_document(futures)))
+            except Exception as e:
+                print(f"Error reading {file_path}: {str(e)}")
+
+    return documents
+
 def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list:
     """Split text into chunks for processing"""
     chunks = []
@@ -47,21 +146,37 @@ def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> l
 
     return [chunk.strip() for chunk in chunks if chunk.strip()]
 
-def process_document(file_path: str):
+def _prepare_chunks(file_path: str, content: str):
+    """Split document content into chunks and build their ids and metadata"""
+    # Split into chunks
+    chunks = split_text(content)
+
+    # Prepare metadata
+    file_name = os.path.basename(file_path)
+    metadatas = [{"source": file_name, "chunk": i} for i in range(len(chunks))]
+    ids = [f"{file_name}_chunk_{i}" for i in range(len(chunks))]
+
+    return ids, chunks, metadatas
+
+def process_document(file_path: str, parallel: bool = False, max_workers: int = None):
     """Process a single document and prepare it for ChromaDB"""
     try:
         # Read the document
-        content = read_document(file_path)
-
-        # Split into chunks
-        chunks = split_text(content)
-
-        # Prepare metadata
-        file_name = os.path.basename(file_path)
-        metadatas = [{"source": file_name, "chunk": i} for i in range(len(chunks))]
-        ids = [f"{file_name}_chunk_{i}" for i in range(len(chunks))]
+        content = read_document(file_path, parallel=parallel, max_workers=max_workers)
 
-        return ids, chunks, metadatas
+        return _prepare_chunks(file_path, content)
     except Exception as e:
         print(f"Error processing {file_path}: {str(e)}")
         return [], [], []
+
+def process_documents(paths, max_workers: int = None):
+    """Process a directory, glob or list of documents in parallel and prepare them for ChromaDB"""
+    all_ids, all_chunks, all_metadatas = [], [], []
+
+    for file_path, content in read_documents(paths, max_workers=max_workers):
+        ids, chunks, metadatas = _prepare_chunks(file_path, content)
+        all_ids.extend(ids)
+        all_chunks.extend(chunks)
+        all_metadatas.extend(metadatas)
+
+    return all_ids, all_chunks, all_metadatas
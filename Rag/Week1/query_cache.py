@@ -0,0 +1,180 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from Rag.Week1.initializedb import current_generation, get_embedding_function
+
+EMBEDDING_CACHE_SIZE = 2048
+RESULT_CACHE_SIZE = 1024
+RESULT_TTL_SECONDS = 600
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, without trailing punctuation"""
+    return re.sub(r'\s+', ' ', query.lower()).strip().rstrip('?.!').strip()
+
+
+class LRUCache:
+    """Small thread-safe LRU with an optional per-entry time to live"""
+
+    def __init__(self, max_items: int, ttl: float = None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_items:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class TierStats:
+    """Hit/miss counts and the latency the hits saved, estimated from the average miss"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+
+    def hit(self):
+        self.hits += 1
+
+    def miss(self, seconds: float):
+        self.misses += 1
+        self.miss_seconds += seconds
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        average_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "avg_miss_ms": average_miss * 1000,
+            "saved_ms": self.hits * average_miss * 1000,
+        }
+
+
+class QueryCache:
+    """Two-tier retrieval cache for semantic_search.
+
+    Tier 1 maps a normalized query to its embedding, tier 2 maps
+    (embedding hash, k) to the Chroma results for a limited time. Both tiers
+    are emptied whenever the ingestion generation moves, i.e. after any write
+    to the collection, so results never outlive the data they came from.
+    """
+
+    def __init__(self, embedding_items: int = EMBEDDING_CACHE_SIZE, result_items: int = RESULT_CACHE_SIZE,
+                 result_ttl: float = RESULT_TTL_SECONDS):
+        self.embeddings = LRUCache(embedding_items)
+        self.results = LRUCache(result_items, ttl=result_ttl)
+        self.embedding_stats = TierStats()
+        self.result_stats = TierStats()
+        self.generation = current_generation()
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def _sync_generation(self):
+        generation = current_generation()
+        if generation != self.generation:
+            with self.lock:
+                if generation != self.generation:
+                    self.embeddings.clear()
+                    self.results.clear()
+                    self.generation = generation
+                    self.invalidations += 1
+
+    def embed(self, query: str):
+        """Embedding of a query, computed once per normalized form"""
+        self._sync_generation()
+        key = normalize_query(query)
+        embedding = self.embeddings.get(key)
+        if embedding is not None:
+            self.embedding_stats.hit()
+            return embedding
+
+        start = time.perf_counter()
+        embedding = get_embedding_function()([query])[0]
+        self.embedding_stats.miss(time.perf_counter() - start)
+        self.embeddings.put(key, embedding)
+        return embedding
+
+    def embed_many(self, queries: list) -> list:
+        """Embeddings of many queries; all uncached ones go through the model in one batch"""
+        self._sync_generation()
+        keys = [normalize_query(query) for query in queries]
+        embeddings = [self.embeddings.get(key) for key in keys]
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], []).append(i)
+            else:
+                self.embedding_stats.hit()
+        if missing:
+            start = time.perf_counter()
+            computed = get_embedding_function()([queries[positions[0]] for positions in missing.values()])
+            elapsed = (time.perf_counter() - start) / len(missing)
+            for (key, positions), embedding in zip(missing.items(), computed):
+                self.embedding_stats.miss(elapsed)
+                self.embeddings.put(key, embedding)
+                for i in positions:
+                    embeddings[i] = embedding
+        return embeddings
+
+    def search(self, collection, query: str, k: int = 5):
+        """Cached equivalent of collection.query for a single query text"""
+        embedding = self.embed(query)
+        key = (hashlib.blake2b(np.asarray(embedding, dtype=np.float32).tobytes(), digest_size=16).digest(), k)
+        results = self.results.get(key)
+        if results is not None:
+            self.result_stats.hit()
+            return results
+
+        start = time.perf_counter()
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+        self.result_stats.miss(time.perf_counter() - start)
+        self.results.put(key, results)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "generation": self.generation,
+            "invalidations": self.invalidations,
+            "embedding_entries": len(self.embeddings),
+            "result_entries": len(self.results),
+            "embedding_tier": self.embedding_stats.as_dict(),
+            "result_tier": self.result_stats.as_dict(),
+        }
+
+
+query_cache = QueryCache()
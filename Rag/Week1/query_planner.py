@@ -0,0 +1,64 @@
+import asyncio
+import re
+import time
+
+from Rag.Week1.ai_client import contextualize_query
+from Rag.Week1.async_utils import run_blocking, retrieval_executor, llm_executor
+
+# Rewrites whose word overlap with the raw prompt is at least this high
+# retrieve (almost) the same chunks, so the speculative results are kept
+REWRITE_SIMILARITY_THRESHOLD = 0.8
+
+# Words that do not change what a query retrieves
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "of", "to", "in",
+    "on", "for", "and", "or", "what", "how", "can", "i", "me", "my", "please", "tell", "about",
+}
+
+_ERROR_PREFIX = "Error generating response"
+
+
+def query_terms(query: str) -> set:
+    return {word for word in re.findall(r'\w+', query.lower()) if word not in STOP_WORDS}
+
+
+def differs_materially(prompt: str, rewritten: str, threshold: float = REWRITE_SIMILARITY_THRESHOLD) -> bool:
+    """True when the rewritten query shares too few terms with the raw prompt to reuse its results"""
+    original, rewrite = query_terms(prompt), query_terms(rewritten)
+    if not original or not rewrite:
+        return original != rewrite
+    return len(original & rewrite) / len(original | rewrite) < threshold
+
+
+def standalone_query(prompt: str, conversation_history: str, ai) -> str:
+    """Collect the contextualized query, falling back to the raw prompt if Bedrock fails"""
+    rewritten = "".join(contextualize_query(prompt, conversation_history, ai)).strip()
+    if not rewritten or rewritten.startswith(_ERROR_PREFIX):
+        return prompt
+    return rewritten
+
+
+async def plan_query(collection, ai, prompt: str, conversation_history: str, search, k: int = 4) -> dict:
+    """Pick the query to answer and retrieve its chunks.
+
+    Without history the prompt is already standalone and is used as is.
+    Otherwise the prompt is contextualized while its own retrieval runs
+    speculatively; the search is only repeated when the rewrite turns out to
+    ask for something materially different.
+    """
+    start = time.perf_counter()
+    speculative = run_blocking(retrieval_executor, search, collection, prompt, k)
+    if not conversation_history.strip():
+        results = await speculative
+        return {"query": prompt, "results": results, "contextualized": False, "re_retrieved": False,
+                "planning_ms": (time.perf_counter() - start) * 1000}
+
+    rewritten, results = await asyncio.gather(
+        run_blocking(llm_executor, standalone_query, prompt, conversation_history, ai),
+        speculative,
+    )
+    re_retrieved = differs_materially(prompt, rewritten)
+    if re_retrieved:
+        results = await run_blocking(retrieval_executor, search, collection, rewritten, k)
+    return {"query": rewritten, "results": results, "contextualized": True, "re_retrieved": re_retrieved,
+            "planning_ms": (time.perf_counter() - start) * 1000}
@@ -0,0 +1,106 @@
+import threading
+import time
+
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Candidates retrieved for re-ranking, and chunks kept afterwards
+RERANK_CANDIDATES = 16
+RERANK_TOP_N = 3
+
+# Time re-ranking may add to a request. The per-pair cost is learned as a
+# moving average, so the number of pairs scored adapts to the machine and
+# to how many requests are re-ranking at the same time
+LATENCY_BUDGET_MS = 150
+INITIAL_PAIR_MS = 4.0
+EMA_WEIGHT = 0.2
+
+# Fewer pairs than this are not worth a forward pass
+MIN_PAIRS = 4
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_reranker():
+    """The shared CPU cross-encoder, loaded once"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+                _model = CrossEncoder(RERANK_MODEL_NAME, device="cpu")
+    return _model
+
+
+class Reranker:
+    """Scores (query, chunk) pairs with a cross-encoder in one batched forward pass.
+
+    Before scoring, the request's latency budget is turned into a number of
+    pairs using the learned per-pair cost multiplied by the number of
+    concurrent re-rankings (they share the CPU). Timings are divided by the
+    load they were measured under, so the learned cost is that of an idle
+    CPU and the load is not counted twice. If the budget does not cover
+    MIN_PAIRS, re-ranking is skipped and the retrieval order is kept;
+    otherwise only the best-ranked candidates that fit are scored.
+    """
+
+    def __init__(self, budget_ms: float = LATENCY_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.pair_ms = INITIAL_PAIR_MS
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.counts = {"reranked": 0, "truncated": 0, "skipped": 0}
+
+    def affordable_pairs(self, budget_ms: float) -> int:
+        with self.lock:
+            load = self.in_flight + 1
+            return int(budget_ms / (self.pair_ms * load))
+
+    def rerank(self, query: str, results: dict, top_n: int = RERANK_TOP_N, budget_ms: float = None) -> dict:
+        """Keep the `top_n` chunks of a Chroma-shaped result the cross-encoder finds most relevant"""
+        documents = results["documents"][0] if results.get("documents") else []
+        if len(documents) <= 1:
+            return results
+
+        pairs = min(len(documents), self.affordable_pairs(self.budget_ms if budget_ms is None else budget_ms))
+        if pairs < min(MIN_PAIRS, len(documents)):
+            with self.lock:
+                self.counts["skipped"] += 1
+            return _take(results, range(min(top_n, len(documents))))
+
+        with self.lock:
+            self.counts["truncated" if pairs < len(documents) else "reranked"] += 1
+            self.in_flight += 1
+            load = self.in_flight
+        try:
+            start = time.perf_counter()
+            scores = get_reranker().predict([(query, document) for document in documents[:pairs]],
+                                            batch_size=pairs, show_progress_bar=False)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        with self.lock:
+            self.pair_ms = (1 - EMA_WEIGHT) * self.pair_ms + EMA_WEIGHT * elapsed_ms / (pairs * load)
+
+        order = sorted(range(pairs), key=lambda i: float(scores[i]), reverse=True)[:top_n]
+        reranked = _take(results, order)
+        reranked["rerank_scores"] = [[float(scores[i]) for i in order]]
+        return reranked
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counts, "pair_ms": self.pair_ms, "budget_ms": self.budget_ms}
+
+
+def _take(results: dict, positions) -> dict:
+    """Chroma-shaped result holding only the given positions of the first query"""
+    positions = list(positions)
+    return {
+        key: [[values[0][i] for i in positions]]
+        for key, values in results.items()
+        if key in ("ids", "documents", "metadatas", "distances") and values
+    }
+
+
+reranker = Reranker()
@@ -0,0 +1,64 @@
+import threading
+import time
+from Rag.Week1.initializedb import initialize_db
+from Rag.Week1.ai_client import initialize_ai
+from Rag.Week1.reranker import get_reranker
+
+# Process-wide retrieval resources, created once and shared by every request
+_collection = None
+_ai_client = None
+_lock = threading.Lock()
+_ready = threading.Event()
+_warm_up_seconds = None
+_warm_up_error = None
+
+
+def get_collection():
+    """Return the shared Chroma collection (client and embedding model load once)"""
+    global _collection
+    if _collection is None:
+        with _lock:
+            if _collection is None:
+                _collection = initialize_db()
+    return _collection
+
+
+def get_ai_client():
+    """Return the shared Bedrock runtime client"""
+    global _ai_client
+    if _ai_client is None:
+        with _lock:
+            if _ai_client is None:
+                _ai_client = initialize_ai()
+    return _ai_client
+
+
+def warm_up():
+    """Create the shared resources and run a dummy query so the first request pays nothing"""
+    global _warm_up_seconds, _warm_up_error
+    start = time.perf_counter()
+    try:
+        collection = get_collection()
+        # Loads the sentence transformer weights and the persisted vector index
+        collection.query(query_texts=["warm-up"], n_results=1)
+        get_ai_client()
+        get_reranker().predict([("warm-up", "warm-up")], show_progress_bar=False)
+    except Exception as e:
+        _warm_up_error = str(e)
+        print(f"Warm-up failed: {e}")
+        return
+    _warm_up_seconds = time.perf_counter() - start
+    _ready.set()
+    print(f"Retrieval resources warm in {_warm_up_seconds:.2f}s")
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def readiness() -> dict:
+    return {
+        "ready": is_ready(),
+        "warm_up_seconds": _warm_up_seconds,
+        "error": _warm_up_error,
+    }
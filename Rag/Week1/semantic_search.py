@@ -1,42 +1,155 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Optional
-from Rag.Week1.initializedb import initialize_db
-from Rag.Week1.ai_client import contextualize_query, generate_response, initialize_ai
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
-from session import create_session, add_message, get_conversation_history, format_history_for_prompt
+from Rag.Week1.ai_client import get_prompt, summarize_history
+from Rag.Week1.llm_providers import provider_stats
+from Rag.Week1.llm_router import get_generation_provider, router_stats
+from Rag.Week1.resources import get_collection, get_ai_client, warm_up, readiness
+from Rag.Week1.query_cache import query_cache
+from Rag.Week1.async_utils import run_blocking, retrieval_executor
+from Rag.Week1.query_planner import plan_query
+from Rag.Week1.hybrid_search import hybrid_search, batch_hybrid_search
+from Rag.Week4.rag_initialization.batch_search import batch_query
+from Rag.Week1.reranker import reranker, RERANK_CANDIDATES
+from Rag.Week1.context_assembler import assemble_context, CONTEXT_TOKEN_BUDGET
+from Rag.Week1.answer_cache import answer_cache, chunk_fingerprint, replay
+from Rag.Week1.singleflight import planning_flights, generation_flights, request_key
+from fastapi import FastAPI, Body
+from fastapi.responses import JSONResponse, StreamingResponse
+from session import create_session, add_message, get_conversation_history, format_history_for_prompt, \
+    set_summarizer, extractive_summary
 
-app = FastAPI()
+# Event loop serving requests; history summaries are scheduled on it from worker threads
+main_loop = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global main_loop
+    main_loop = asyncio.get_running_loop()
+    # Warm up in the background so the server can answer /ready while loading
+    warm_up_task = main_loop.run_in_executor(None, warm_up)
+    yield
+    await warm_up_task
+
+app = FastAPI(lifespan=lifespan)
+
+def _summarize_history(previous_summary, messages):
+    try:
+        return summarize_history(previous_summary, messages, loop=main_loop)
+    except Exception as e:
+        print(f"LLM history summary failed, using extractive summary: {e}")
+        return extractive_summary(previous_summary, messages)
+
+# Older turns are folded into a running LLM summary in the background
+set_summarizer(_summarize_history)
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the shared retrieval resources are warm, 503 before"""
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit ratios and saved latency of the query embedding and result caches, and answer cache hits"""
+    return {**query_cache.stats(), "answer_cache": answer_cache.stats(),
+            "coalescing": {"planning": planning_flights.stats(), "generation": generation_flights.stats()}}
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Time to first token, tokens/sec and total latency per LLM provider"""
+    return provider_stats()
+
+@app.get("/llm/hedge/stats")
+async def hedge_stats():
+    """How often generation was hedged or fell back to the secondary provider, and the current deadline"""
+    return router_stats()
+
+@app.get("/rerank/stats")
+async def rerank_stats():
+    """How often re-ranking ran in full, was truncated or skipped, and its learned per-pair cost"""
+    return reranker.stats()
+
+@app.post("/search/batch")
+async def search_batch(payload: dict = Body(...)):
+    """Retrieve for many queries at once.
+
+    Body: {"queries": ["text" | {"query": str, "k": int, "where": {...}}, ...], "hybrid": true}
+    """
+    collection = await run_blocking(retrieval_executor, get_collection)
+    queries = payload.get("queries") or []
+    try:
+        results = await run_blocking(
+            retrieval_executor, batch_semantic_search, collection, queries, payload.get("hybrid", True)
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        return JSONResponse({"error": f"Invalid batch request: {e}"}, status_code=400)
+    return {"results": [
+        {
+            "query": query if isinstance(query, str) else query["query"],
+            **{key: values[0] for key, values in result.items()},
+        }
+        for query, result in zip(queries, results)
+    ]}
 
 @app.get("/stream")
-async def stream_response(prompt: str, sessionId: Optional[str] = None):
+async def stream_response(prompt: str, sessionId: Optional[str] = None, useCache: bool = True):
     try:
         print(f"Prompt: {prompt}")
-        collection = initialize_db()
+        # Blocking work (model load, Chroma, Bedrock) runs on bounded executors, never on the event loop
+        collection = await run_blocking(retrieval_executor, get_collection)
         if(sessionId is None):
             sessionId = create_session()
 
         print(f"Session ID: {sessionId}")
 
 
-        results = semantic_search(collection, prompt)
-        context, sources = get_context_with_sources(results)
-        ai = initialize_ai()
-
+        ai = await run_blocking(retrieval_executor, get_ai_client)
         conversation_history = format_history_for_prompt(sessionId)
 
-        result = contextualize_query(prompt, conversation_history, ai)
-        print(f"Result: {result}")
+        # Identical questions arriving together (same prompt and history) share one plan
+        plan = await planning_flights.do(
+            request_key(prompt, conversation_history),
+            lambda: plan_query(collection, ai, prompt, conversation_history, semantic_search),
+        )
+        result = plan["query"]
+        print(f"Result: {result} (contextualized: {plan['contextualized']}, "
+              f"re-retrieved: {plan['re_retrieved']}, planning: {plan['planning_ms']:.0f}ms)")
+        context, sources = get_context_with_sources(plan["results"])
+
+        # With history the answer may depend on earlier turns, so only first questions are cached
+        fingerprint = chunk_fingerprint(plan["results"]) if useCache and not conversation_history.strip() else None
+        query_embedding = await run_blocking(retrieval_executor, query_cache.embed, result) if fingerprint else None
+        cached_chunks = answer_cache.get(query_embedding, fingerprint) if fingerprint else None
+        cache_status = "bypass" if fingerprint is None else "hit" if cached_chunks is not None else "miss"
         # Collect the full response
         full_response = ""
 
-        def generate_stream():
+        async def generate_stream():
             nonlocal full_response
+            streamed = []
+            completed = False
             try:
                 print("--------------------------------",conversation_history,"--------------------------------")
-                for chunk in generate_response(ai, result, context, conversation_history):
+                # Concurrent requests with the same question and context share one generation;
+                # each still streams every chunk and writes its own session history below
+                generation_prompt = get_prompt(context, conversation_history, result)
+                source = replay(cached_chunks) if cached_chunks is not None else generation_flights.stream(
+                    request_key(result, context, conversation_history),
+                    lambda: get_generation_provider().stream(generation_prompt),
+                )
+                async for chunk in source:
                     full_response += chunk
+                    streamed.append(chunk)
                     yield chunk
+                completed = True
+            except Exception as e:
+                print(f"Error generating response: {e}")
+                yield f"Error generating response: {str(e)}"
             finally:
+                # Only a source that ended cleanly is cached; errors and disconnects leave completed False
+                if cache_status == "miss" and completed:
+                    answer_cache.put(query_embedding, fingerprint, streamed)
                 # Ensure the response is saved even if streaming stops
                 if full_response.strip():
                     add_message(sessionId, "assistant", full_response)
@@ -48,14 +161,32 @@ async def stream_response(prompt: str, sessionId: Optional[str] = None):
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
+                "X-Accel-Buffering": "no",
+                "X-Answer-Cache": cache_status
             }
         )
     except Exception as e:
         print(f"Error in stream_response: {e}")
         return {"error": str(e)}
 
-def semantic_search(collection, query, k=5):
+def semantic_search(collection, query, k=4, use_cache=True, hybrid=True, rerank=True):
+    if rerank:
+        # Retrieve wider, then let the cross-encoder keep the k chunks worth sending to the LLM
+        candidates = semantic_search(collection, query, max(k, RERANK_CANDIDATES), use_cache, hybrid, rerank=False)
+        return reranker.rerank(query, candidates, top_n=k)
+
+    if hybrid:
+        # BM25 catches exact terms (plan names, form numbers, acronyms) the embeddings miss,
+        # so fewer chunks are needed than with vector search alone
+        return hybrid_search(
+            collection, query,
+            lambda collection, query, n: semantic_search(collection, query, n, use_cache, hybrid=False, rerank=False),
+            k=k,
+        )
+
+    if use_cache:
+        return query_cache.search(collection, query, k)
+
     results = collection.query(
         query_texts=[query],
         n_results=k,
@@ -63,21 +194,17 @@ def semantic_search(collection, query, k=5):
     )
     return results
 
-def get_context_with_sources(results):
+def batch_semantic_search(collection, queries, hybrid=True, k=4):
+    """semantic_search for many queries: one embedding pass and one collection query per filter"""
+    if hybrid:
+        return batch_hybrid_search(collection, queries, query_cache.embed_many, default_k=k)
+    return batch_query(collection, queries, embed=query_cache.embed_many, default_k=k)
+
+def get_context_with_sources(results, max_tokens=CONTEXT_TOKEN_BUDGET):
     """Extract context and source information from search results"""
     # Check if results contain documents
     if not results or not results.get('documents') or not results['documents'][0]:
         return "No relevant documents found.", []
 
-    # Combine document chunks into a single context
-    context = "\n\n".join(results['documents'][0])
-
-    # Format sources with metadata
-    sources = []
-    if results.get('metadatas') and results['metadatas'][0]:
-        sources = [
-            f"{meta['source']} (chunk {meta['chunk']})"
-            for meta in results['metadatas'][0]
-        ]
-
-    return context, sources
+    # Merge neighbouring chunks, drop their repeated overlap and pack to the token budget
+    return assemble_context(results, max_tokens)
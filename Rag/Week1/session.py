@@ -1,10 +1,55 @@
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
 
 # In-memory conversation store
 conversations = {}
 
+# Tokens are estimated at ~4 characters each, as in the context assembler
+CHARS_PER_TOKEN = 4
+
+# Compacted history: recent messages verbatim up to HISTORY_TOKEN_BUDGET,
+# older ones folded into a running summary of at most SUMMARY_TOKEN_BUDGET
+COMPACT_HISTORY = True
+HISTORY_TOKEN_BUDGET = 600
+SUMMARY_TOKEN_BUDGET = 200
+
+# session id -> {"text": summary, "covered": number of leading messages it folds in}
+summaries = {}
+_refreshing = set()
+_summary_lock = threading.Lock()
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _role_label(msg) -> str:
+    return "Human" if msg["role"] == "user" else "Assistant"
+
+
+def extractive_summary(previous_summary: str, messages: list, max_tokens: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """Fallback summarizer: the first sentence of each folded message, newest kept when over budget"""
+    lines = [previous_summary] if previous_summary else []
+    for msg in messages:
+        first_sentence = msg["content"].strip().split(". ")[0][:200]
+        lines.append(f"{_role_label(msg)}: {first_sentence}")
+    summary = "\n".join(lines)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return summary[-max_chars:] if len(summary) > max_chars else summary
+
+
+# summarizer(previous_summary, messages) -> new summary; replaced by an LLM-backed one when available
+_summarizer = extractive_summary
+
+
+def set_summarizer(summarizer):
+    global _summarizer
+    _summarizer = summarizer
+
 def create_session():
     """Create a new conversation session"""
     session_id = str(uuid.uuid4())
@@ -20,6 +65,7 @@ def add_message(session_id, role, content):
     conversations[session_id].append({
         "role": role,
         "content": content,
+        "tokens": estimate_tokens(content),
         "timestamp": datetime.now().isoformat()
     })
 
@@ -35,8 +81,12 @@ def get_conversation_history(session_id: str, max_messages: int = None):
     return history
 
 
-def format_history_for_prompt(session_id: str, max_messages: int = 5):
+def format_history_for_prompt(session_id: str, max_messages: int = 5, compact: bool = COMPACT_HISTORY,
+                              token_budget: int = HISTORY_TOKEN_BUDGET):
     """Format conversation history for inclusion in prompts"""
+    if compact:
+        return format_compacted_history(session_id, token_budget)
+
     history = get_conversation_history(session_id, max_messages)
     formatted_history = ""
 
@@ -45,3 +95,67 @@ def format_history_for_prompt(session_id: str, max_messages: int = 5):
         formatted_history += f"{role}: {msg['content']}\n\n"
 
     return formatted_history.strip()
+
+
+def format_compacted_history(session_id: str, token_budget: int = HISTORY_TOKEN_BUDGET) -> str:
+    """Running summary of older turns plus the newest messages verbatim, bounded in tokens.
+
+    Messages that fall outside the verbatim budget are folded into the
+    session summary by a background refresh. Until it covers them, they are
+    added to the previous summary with the cheap extractive summarizer, so
+    no request waits for summarization and no turn drops out of the prompt.
+    """
+    history = get_conversation_history(session_id)
+    if not history:
+        return ""
+
+    # Newest messages first, as many as fit; the latest is always kept, truncated if needed
+    first_verbatim, used = len(history), 0
+    for i in range(len(history) - 1, -1, -1):
+        tokens = history[i].get("tokens", estimate_tokens(history[i]["content"]))
+        if used + tokens > token_budget and first_verbatim < len(history):
+            break
+        first_verbatim, used = i, used + tokens
+
+    verbatim = []
+    for msg in history[first_verbatim:]:
+        content = msg["content"]
+        if estimate_tokens(content) > token_budget:
+            content = content[:token_budget * CHARS_PER_TOKEN] + "..."
+        verbatim.append(f"{_role_label(msg)}: {content}")
+
+    summary = summaries.get(session_id) or {"text": "", "covered": 0}
+    summary_text = summary["text"]
+    if first_verbatim > summary["covered"]:
+        refresh_summary(session_id, first_verbatim)
+        summary_text = extractive_summary(summary_text, history[summary["covered"]:first_verbatim])
+
+    parts = []
+    if summary_text:
+        parts.append(f"Summary of earlier conversation: {summary_text}")
+    parts.extend(verbatim)
+    return "\n\n".join(parts)
+
+
+def refresh_summary(session_id: str, fold_until: int):
+    """Fold messages up to `fold_until` into the session summary in the background"""
+    with _summary_lock:
+        if session_id in _refreshing:
+            return
+        _refreshing.add(session_id)
+
+    def fold():
+        try:
+            summary = summaries.get(session_id) or {"text": "", "covered": 0}
+            messages = conversations.get(session_id, [])[summary["covered"]:fold_until]
+            if messages:
+                text = _summarizer(summary["text"], messages)
+                max_chars = SUMMARY_TOKEN_BUDGET * CHARS_PER_TOKEN
+                summaries[session_id] = {"text": text[-max_chars:], "covered": fold_until}
+        except Exception as e:
+            print(f"Error summarizing session {session_id}: {e}")
+        finally:
+            with _summary_lock:
+                _refreshing.discard(session_id)
+
+    _summary_executor.submit(fold)
@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+
+from Rag.Week1.query_cache import normalize_query
+
+
+def request_key(query: str, *parts: str) -> str:
+    """Coalescing key: the normalized query plus anything else the upstream call depends on"""
+    digest = hashlib.blake2b(normalize_query(query).encode("utf-8"), digest_size=16)
+    for part in parts:
+        digest.update(b"\0" + (part or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task = None
+
+
+class SingleFlight:
+    """Share one upstream call between concurrent identical requests.
+
+    `do` coalesces plain awaitables. `stream` coalesces async streams: the
+    first caller for a key starts the upstream stream in a task, every
+    caller (including ones that join late) receives all chunks from the
+    start, and the upstream is cancelled if every subscriber goes away.
+    Finished flights are forgotten, so only concurrent requests share work.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.calls = {}
+        self.upstream = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, make_awaitable):
+        future = self.calls.get(key)
+        if future is None:
+            self.upstream += 1
+            future = asyncio.ensure_future(make_awaitable())
+            self.calls[key] = future
+            future.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller being cancelled must not cancel the shared call
+        return await asyncio.shield(future)
+
+    async def _produce(self, key: str, flight: _Flight, make_stream):
+        try:
+            async for chunk in make_stream():
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+            flight.done = True
+            async with flight.changed:
+                flight.changed.notify_all()
+
+    async def stream(self, key: str, make_stream):
+        """Chunks of the shared stream for `key`, starting it if no identical request is in flight"""
+        flight = self.flights.get(key)
+        if flight is None:
+            self.upstream += 1
+            flight = _Flight()
+            self.flights[key] = flight
+            flight.task = asyncio.ensure_future(self._produce(key, flight, make_stream))
+        else:
+            self.coalesced += 1
+
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(flight.chunks):
+                    chunk = flight.chunks[position]
+                    position += 1
+                    yield chunk
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: position < len(flight.chunks) or flight.done)
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more; stop paying for the upstream call
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+                flight.task.cancel()
+
+    def stats(self) -> dict:
+        total = self.upstream + self.coalesced
+        return {
+            "in_flight": len(self.flights) + len(self.calls),
+            "upstream_calls": self.upstream,
+            "coalesced_requests": self.coalesced,
+            "coalesced_ratio": self.coalesced / total if total else 0.0,
+        }
+
+
+planning_flights = SingleFlight()
+generation_flights = SingleFlight()
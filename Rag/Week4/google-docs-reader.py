@@ -2,17 +2,18 @@
 """
 Simple Google Docs Reader MCP Server
 """
-from typing import Any, Dict, List
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 from mcp.server.fastmcp import FastMCP
+import io
 import os.path
 import pickle
 import PyPDF2
-import tempfile
 
 
 # Google Docs API scopes
@@ -22,6 +23,11 @@ SCOPES = [
 ]
 mcp = FastMCP("google-docs-reader")
 
+# Extracted page texts keyed by (file_id, modifiedTime); a new upload changes
+# modifiedTime, so stale entries are simply never looked up again
+PDF_TEXT_CACHE_SIZE = 32
+pdf_text_cache = OrderedDict()
+
 def get_credentials() -> Credentials:
     """Get valid user credentials from storage.
 
@@ -66,35 +72,72 @@ async def list_documents() -> List[Dict[str, Any]]:
         # Return an empty list or a list with an error dict, depending on your needs
         return [{"error": str(e)}]
 
+def download_drive_file(service, file_id: str) -> io.BytesIO:
+    """Download a Drive file into an in-memory buffer"""
+    buffer = io.BytesIO()
+    request = service.files().get_media(fileId=file_id)
+    downloader = MediaIoBaseDownload(buffer, request, chunksize=10 * 1024 * 1024)
+    done = False
+    while not done:
+        status, done = downloader.next_chunk()
+    buffer.seek(0)
+    return buffer
+
+
+def get_pdf_pages(service, file_id: str, start_page: Optional[int] = None, end_page: Optional[int] = None):
+    """Return (page texts in the 1-based inclusive range, total page count) for a Drive PDF.
+
+    Only the requested pages are extracted. Extracted pages are cached under
+    the file's modifiedTime, so repeat calls for an unchanged file skip the
+    download and extraction entirely.
+    """
+    metadata = service.files().get(fileId=file_id, fields="modifiedTime").execute()
+    cache_key = (file_id, metadata.get("modifiedTime"))
+
+    # None marks a page that has not been extracted yet
+    pages = pdf_text_cache.get(cache_key)
+    if pages is not None:
+        pdf_text_cache.move_to_end(cache_key)
+
+    reader = None
+    if pages is None:
+        reader = PyPDF2.PdfReader(download_drive_file(service, file_id))
+        pages = [None] * len(reader.pages)
+
+    first = max((start_page or 1) - 1, 0)
+    last = min(end_page or len(pages), len(pages))
+    if any(pages[i] is None for i in range(first, last)):
+        if reader is None:
+            reader = PyPDF2.PdfReader(download_drive_file(service, file_id))
+        for i in range(first, last):
+            if pages[i] is None:
+                pages[i] = reader.pages[i].extract_text() or ""
+
+    pdf_text_cache[cache_key] = pages
+    if len(pdf_text_cache) > PDF_TEXT_CACHE_SIZE:
+        pdf_text_cache.popitem(last=False)
+    return pages[first:last], len(pages)
+
+
 @mcp.tool()
-async def read_pdf_from_drive(file_id: str = '1gV9RCL70OeCGGN0gyaSftKU8VK_OYtvH') -> dict:
+async def read_pdf_from_drive(file_id: str = '1gV9RCL70OeCGGN0gyaSftKU8VK_OYtvH',
+                              start_page: Optional[int] = None, end_page: Optional[int] = None) -> dict:
     """
     Download a PDF from Google Drive and return its text content.
 
     Args:
         file_id: The ID of the PDF file on Google Drive.
+        start_page: Optional first page to return (1-based, inclusive).
+        end_page: Optional last page to return (1-based, inclusive).
     """
     try:
         service = get_drive_service()
-        # Use a temporary file to store the PDF
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=True) as tmp_file:
-            request = service.files().get_media(fileId=file_id)
-            downloader = MediaIoBaseDownload(tmp_file, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            tmp_file.flush()
-
-            # Now read the PDF content
-            tmp_file.seek(0)
-            reader = PyPDF2.PdfReader(tmp_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
+        pages, page_count = get_pdf_pages(service, file_id, start_page, end_page)
 
         return {
             "success": True,
-            "text": text
+            "text": "".join(pages),
+            "page_count": page_count
         }
     except Exception as e:
         return {
@@ -1,26 +1,103 @@
-from rag_initialization.initializedb import initialize_db
+import sys
+import threading
+import time
+from rag_initialization.initializedb import initialize_db, current_generation
+from rag_initialization.bm25_index import load_bm25_index, hybrid_results
+from rag_initialization.batch_search import batch_query, normalize_requests
 from mcp.server.fastmcp import FastMCP
 
 mcp = FastMCP("rag-search-server")
 
+# Opened once at startup and shared by every tool call
+collection = None
+collection_lock = threading.Lock()
+warm = threading.Event()
+
+
+def get_collection():
+    global collection
+    if collection is None:
+        with collection_lock:
+            if collection is None:
+                collection = initialize_db()
+    return collection
+
+
+bm25_index = None
+bm25_lock = threading.Lock()
+
+
+def get_bm25_index():
+    """Lexical index of the collection, reloaded when an ingestion has moved the generation"""
+    global bm25_index
+    generation = current_generation()
+    if bm25_index is None or bm25_index.generation != generation:
+        with bm25_lock:
+            if bm25_index is None or bm25_index.generation != generation:
+                bm25_index = load_bm25_index(get_collection(), generation=generation)
+    return bm25_index
+
+
+def warm_up():
+    """Open the collection and run a dummy query to load the embedding model and index"""
+    start = time.perf_counter()
+    try:
+        get_collection().query(query_texts=["warm-up"], n_results=1)
+        get_bm25_index()
+    except Exception as e:
+        # stdout carries the MCP stdio protocol, so log to stderr
+        print(f"Warm-up failed: {e}", file=sys.stderr)
+        return
+    warm.set()
+    print(f"RAG search server warm in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
 
 @mcp.tool()
 def get_context_with_sources(query):
-        collection = initialize_db()
-        results =  semantic_search(collection, query)
+        results =  semantic_search(get_collection(), query)
         return results
 
 
-def semantic_search(collection, query, k=5):
+@mcp.tool()
+def batch_search(queries: list) -> list:
+    """Retrieve chunks for many queries in one pass.
+
+    Each query is a string or {"query": str, "k": int, "where": {metadata filter}}.
+    All query texts are embedded in one batch and each distinct filter is a
+    single multi-query collection lookup; results come back in input order.
+    """
+    requests = normalize_requests(queries, default_k=4)
+    results = batch_query(get_collection(), requests, n_results=lambda k: max(k, 20))
+    index = get_bm25_index()
+    return [
+        {"query": request["query"], **{key: values[0] for key, values in hybrid_results(
+            get_collection(), result,
+            [hit for hit in index.search(request["query"], 20)
+             if request["where"] is None or hit[0] in result["ids"][0]],
+            request["k"],
+        ).items()}}
+        for request, result in zip(requests, results)
+    ]
+
+
+@mcp.tool()
+def ready() -> dict:
+    """Report whether the retrieval resources have finished warming up"""
+    return {"ready": warm.is_set()}
+
+
+def semantic_search(collection, query, k=4, candidates=20):
 
     results = collection.query(
         query_texts=[query],
-        n_results=k,
+        n_results=candidates,
         include=["documents", "metadatas", "distances"]
     )
-    return results
+    # Fuse with BM25 so exact terms (form numbers, acronyms) rank without a large k
+    return hybrid_results(collection, results, get_bm25_index().search(query, candidates), k)
 
 if __name__ == "__main__":
     print("RAG Search Server started")
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
     mcp.run()
     # print(get_context_with_sources("What are the benefits of Presidio?"))
\ No newline at end of file
@@ -0,0 +1,62 @@
+import json
+
+DEFAULT_K = 5
+
+# Upper bound on queries per batch and on k, so one call cannot monopolise the index
+MAX_BATCH_QUERIES = 256
+MAX_K = 50
+
+
+def normalize_requests(queries: list, default_k: int = DEFAULT_K) -> list:
+    """Accept plain strings or {"query", "k", "where"} dicts and validate them"""
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"At most {MAX_BATCH_QUERIES} queries per batch")
+    requests = []
+    for item in queries:
+        if isinstance(item, str):
+            item = {"query": item}
+        k = int(item.get("k") or default_k)
+        if not 1 <= k <= MAX_K:
+            raise ValueError(f"k must be between 1 and {MAX_K}")
+        requests.append({"query": item["query"], "k": k, "where": item.get("where") or None})
+    return requests
+
+
+def batch_query(collection, queries: list, embed=None, default_k: int = DEFAULT_K, n_results=None) -> list:
+    """Retrieve for many queries with one embedding pass and one query call per filter.
+
+    Queries are grouped by their `where` filter (Chroma takes a single filter
+    per call). Each group is answered by one multi-query collection.query
+    with the group's largest k, and the results are trimmed back per query.
+    `embed(texts)` embeds all query texts in one batch; without it the texts
+    are passed to Chroma, which also embeds them in one call.
+    `n_results(k)` may widen what is fetched (e.g. for later fusion).
+    Returns one Chroma-shaped single-query result per input, in input order.
+    """
+    requests = normalize_requests(queries, default_k)
+    embeddings = embed([request["query"] for request in requests]) if embed is not None and requests else None
+
+    groups = {}
+    for position, request in enumerate(requests):
+        key = json.dumps(request["where"], sort_keys=True)
+        groups.setdefault(key, []).append(position)
+
+    results = [None] * len(requests)
+    for positions in groups.values():
+        where = requests[positions[0]]["where"]
+        fetch = max(n_results(requests[p]["k"]) if n_results else requests[p]["k"] for p in positions)
+        options = {"n_results": fetch, "include": ["documents", "metadatas", "distances"]}
+        if where:
+            options["where"] = where
+        if embeddings is not None:
+            response = collection.query(query_embeddings=[embeddings[p] for p in positions], **options)
+        else:
+            response = collection.query(query_texts=[requests[p]["query"] for p in positions], **options)
+
+        for index, position in enumerate(positions):
+            keep = n_results(requests[position]["k"]) if n_results else requests[position]["k"]
+            results[position] = {
+                key: [response[key][index][:keep]]
+                for key in ("ids", "documents", "metadatas", "distances") if response.get(key)
+            }
+    return results
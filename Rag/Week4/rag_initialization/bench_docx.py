@@ -0,0 +1,62 @@
+"""Compare the streaming DOCX reader with the python-docx reader.
+
+Usage: python bench_docx.py <file.docx> [<file.docx> ...]
+
+Each reader runs in a fresh process so its peak RSS is measured on its own.
+"""
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from processDocs import iter_docx_blocks
+
+
+def read_with_python_docx(file_path: str) -> str:
+    # The previous read_document path: full object model, paragraphs only
+    from docx import Document
+    doc = Document(file_path)
+    return '\n'.join(paragraph.text for paragraph in doc.paragraphs)
+
+
+def read_streaming(file_path: str) -> str:
+    return '\n'.join(iter_docx_blocks(file_path))
+
+
+READERS = {
+    "python-docx": read_with_python_docx,
+    "streaming": read_streaming,
+}
+
+
+def _measure(reader_name: str, file_path: str):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    text = READERS[reader_name](file_path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, len(text), baseline, peak
+
+
+def benchmark(file_path: str, repeat: int = 3):
+    print(f"\n{file_path}")
+    context = multiprocessing.get_context("spawn")
+    for reader_name in READERS:
+        timings = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                elapsed, chars, baseline, peak = pool.submit(_measure, reader_name, file_path).result()
+            timings.append(elapsed)
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        unit = 1 if sys.platform == "darwin" else 1024
+        print(f"  {reader_name:12} best {min(timings) * 1000:8.1f} ms  "
+              f"peak RSS +{(peak - baseline) * unit / 2 ** 20:7.1f} MiB  {chars} chars")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    for path in sys.argv[1:]:
+        benchmark(path)
@@ -0,0 +1,133 @@
+"""Compare the memory-mapped vector index with Chroma on recall, latency and RSS.
+
+Usage:
+    python bench_vector_index.py [--synthetic N] [--queries 200] [--k 5]
+
+By default the vectors of rag_collection are exported and re-indexed by every
+backend in a temporary directory; --synthetic N uses N clustered random
+vectors instead. Queries are stored vectors with a little noise, and recall@k
+is measured against an exact float32 search. Each backend is opened and
+queried in a fresh process so its load time and peak RSS are its own.
+"""
+import argparse
+import multiprocessing
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from initializedb import initialize_db
+from vector_index import MemmapCollection
+
+DIM = 384
+WRITE_BATCH = 5000
+
+BACKENDS = ["chroma", "memmap-int8", "memmap-float16", "memmap-int8-ivf"]
+
+
+def export_collection():
+    collection = initialize_db("chroma")
+    batch = collection.get(include=["embeddings"])
+    return batch["ids"], np.asarray(batch["embeddings"], dtype=np.float32)
+
+
+def synthetic_vectors(count: int, clusters: int = 256):
+    rng = np.random.RandomState(0)
+    centers = rng.randn(clusters, DIM).astype(np.float32)
+    vectors = centers[rng.randint(0, clusters, count)] + 0.6 * rng.randn(count, DIM).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"chunk_{i}" for i in range(count)], vectors
+
+
+def open_backend(name: str, path: str):
+    if name == "chroma":
+        import chromadb
+        return chromadb.PersistentClient(path=path).get_or_create_collection("bench")
+    quantization = "float16" if "float16" in name else "int8"
+    return MemmapCollection(path, quantization=quantization)
+
+
+def build(name: str, path: str, ids: list, vectors: np.ndarray):
+    collection = open_backend(name, path)
+    for start in range(0, len(ids), WRITE_BATCH):
+        collection.add(ids=ids[start:start + WRITE_BATCH], embeddings=vectors[start:start + WRITE_BATCH].tolist(),
+                       documents=ids[start:start + WRITE_BATCH],
+                       metadatas=[{"chunk": i} for i in range(start, min(start + WRITE_BATCH, len(ids)))])
+    if name.endswith("-ivf"):
+        collection.build_ivf()
+
+
+def peak_rss_mib() -> float:
+    """Peak RSS of this process. VmHWM is used where available since, unlike
+    ru_maxrss, it is not inherited from the (large) parent across exec."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20
+
+
+def _measure(name: str, path: str, queries: np.ndarray, k: int):
+    baseline = peak_rss_mib()
+    start = time.perf_counter()
+    collection = open_backend(name, path)
+    collection.count()
+    load_seconds = time.perf_counter() - start
+
+    # The memmap index builds IVF lists by itself on large corpora; only the -ivf variant may use them
+    options = {} if name == "chroma" else {"use_ivf": name.endswith("-ivf")}
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"], **options)
+        latencies.append(time.perf_counter() - start)
+        found.append(result["ids"][0])
+    peak = peak_rss_mib()
+    return load_seconds, latencies, found, baseline, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped vector index vs Chroma")
+    parser.add_argument("--synthetic", type=int, help="benchmark N synthetic vectors instead of rag_collection")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    ids, vectors = synthetic_vectors(args.synthetic) if args.synthetic else export_collection()
+    if not ids:
+        print("No vectors to benchmark")
+        sys.exit(1)
+    rng = np.random.RandomState(1)
+    sample = rng.choice(len(ids), min(args.queries, len(ids)), replace=False)
+    queries = vectors[sample] + 0.05 * rng.randn(len(sample), vectors.shape[1]).astype(np.float32)
+    truth = [set(ids[i] for i in np.argsort(((vectors - query) ** 2).sum(axis=1))[:args.k]) for query in queries]
+    print(f"{len(ids)} vectors, {len(queries)} queries, k={args.k}")
+
+    context = multiprocessing.get_context("spawn")
+    for name in BACKENDS:
+        path = tempfile.mkdtemp(prefix=f"bench-{name}-")
+        try:
+            build(name, path, ids, vectors)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                load_seconds, latencies, found, baseline, peak = pool.submit(
+                    _measure, name, path, queries, args.k).result()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+        recall = np.mean([len(truth[i] & set(found[i])) / args.k for i in range(len(queries))])
+        latencies = np.sort(latencies) * 1000
+        print(f"  {name:16} recall@{args.k} {recall:.3f}  load {load_seconds * 1000:7.1f} ms  "
+              f"p50 {np.percentile(latencies, 50):6.2f} ms  p95 {np.percentile(latencies, 95):6.2f} ms  "
+              f"peak RSS {peak:7.1f} MiB (+{peak - baseline:.1f} after imports)")
+
+
+if __name__ == "__main__":
+    main()
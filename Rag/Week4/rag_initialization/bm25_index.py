@@ -0,0 +1,194 @@
+import os
+import pickle
+import re
+from collections import Counter
+
+import numpy as np
+
+try:
+    from .initializedb import CHROMA_DB_PATH, current_generation
+except ImportError:
+    from initializedb import CHROMA_DB_PATH, current_generation
+
+BM25_INDEX_PATH = os.path.join(os.path.dirname(CHROMA_DB_PATH), "bm25_index.pkl")
+
+# Standard Okapi BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Chunks read from the collection per get() call while building
+READ_BATCH_SIZE = 5000
+
+# Rank constant of reciprocal rank fusion; 60 is the usual choice
+RRF_K = 60
+
+# Words, plus compounds such as form numbers ("w-2", "i-9", "401.k") kept whole
+_TOKEN = re.compile(r'\w+(?:[-/.]\w+)*')
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased terms of a text; compound terms are indexed whole and by their parts"""
+    tokens = []
+    for match in _TOKEN.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in re.split(r'[-/._]', match) if part)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index over the chunks of a collection, scored with BM25.
+
+    Postings are stored CSR style in three flat arrays: `offsets` gives each
+    term's slice of `docs` (chunk positions) and `weights` (the chunk's BM25
+    weight for the term, precomputed at build time). A query only sums a few
+    slices, so lexical scoring stays in the microseconds.
+    """
+
+    def __init__(self, ids: list, vocabulary: dict, offsets: np.ndarray, docs: np.ndarray,
+                 weights: np.ndarray, generation: int = 0):
+        self.ids = ids
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.generation = generation
+
+    @classmethod
+    def from_texts(cls, ids: list, texts: list, generation: int = 0, k1: float = K1, b: float = B):
+        term_frequencies = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(tf.values()) for tf in term_frequencies], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        postings = {}
+        for position, tf in enumerate(term_frequencies):
+            for term, count in tf.items():
+                postings.setdefault(term, []).append((position, count))
+
+        vocabulary = {}
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        docs = np.empty(sum(len(p) for p in postings.values()), dtype=np.int32)
+        weights = np.empty(len(docs), dtype=np.float32)
+        total = len(texts)
+        cursor = 0
+        for term_id, (term, posting) in enumerate(postings.items()):
+            vocabulary[term] = term_id
+            positions = np.array([position for position, _ in posting], dtype=np.int32)
+            counts = np.array([count for _, count in posting], dtype=np.float32)
+            idf = np.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+            norm = k1 * (1 - b + b * lengths[positions] / max(average_length, 1e-9))
+            docs[cursor:cursor + len(posting)] = positions
+            weights[cursor:cursor + len(posting)] = idf * counts * (k1 + 1) / (counts + norm)
+            cursor += len(posting)
+            offsets[term_id + 1] = cursor
+        return cls(list(ids), vocabulary, offsets, docs, weights, generation)
+
+    @classmethod
+    def from_collection(cls, collection, generation: int = None):
+        """Build the index from every chunk currently stored in a Chroma collection"""
+        ids, texts = [], []
+        offset = 0
+        while True:
+            batch = collection.get(include=["documents"], limit=READ_BATCH_SIZE, offset=offset)
+            if not batch["ids"]:
+                break
+            ids.extend(batch["ids"])
+            texts.extend(document or "" for document in batch["documents"])
+            offset += len(batch["ids"])
+        return cls.from_texts(ids, texts, current_generation() if generation is None else generation)
+
+    def search(self, query: str, k: int = 20) -> list:
+        """Top `k` (chunk id, BM25 score) pairs for a query"""
+        term_ids = {self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary}
+        if not term_ids:
+            return []
+
+        if len(term_ids) == 1:
+            term_id = term_ids.pop()
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            candidates, candidate_scores = self.docs[start:end], self.weights[start:end]
+        else:
+            slices = [slice(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+            candidates, inverse = np.unique(np.concatenate([self.docs[s] for s in slices]), return_inverse=True)
+            candidate_scores = np.bincount(inverse, weights=np.concatenate([self.weights[s] for s in slices]))
+
+        if len(candidates) > k:
+            top = np.argpartition(-candidate_scores, k)[:k]
+            candidates, candidate_scores = candidates[top], candidate_scores[top]
+        order = np.argsort(-candidate_scores, kind="stable")
+        return [(self.ids[candidates[position]], float(candidate_scores[position])) for position in order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def save(self, path: str = BM25_INDEX_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({
+                "generation": self.generation, "ids": self.ids, "vocabulary": self.vocabulary,
+                "offsets": self.offsets, "docs": self.docs, "weights": self.weights,
+            }, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = BM25_INDEX_PATH):
+        with open(path, 'rb') as file:
+            state = pickle.load(file)
+        return cls(state["ids"], state["vocabulary"], state["offsets"], state["docs"],
+                   state["weights"], state["generation"])
+
+
+def rebuild_bm25_index(collection, path: str = BM25_INDEX_PATH, generation: int = None) -> BM25Index:
+    """Rebuild the snapshot after ingestion, tagged with the collection's current generation"""
+    index = BM25Index.from_collection(collection, generation)
+    index.save(path)
+    return index
+
+
+def load_bm25_index(collection, path: str = BM25_INDEX_PATH, generation: int = None) -> BM25Index:
+    """The snapshot if it matches the collection's generation, otherwise a fresh rebuild"""
+    generation = current_generation() if generation is None else generation
+    if os.path.exists(path):
+        index = BM25Index.load(path)
+        if index.generation == generation:
+            return index
+    return rebuild_bm25_index(collection, path, generation)
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K, limit: int = None) -> list:
+    """Fuse ranked lists of chunk ids into one (chunk id, score) ranking by RRF"""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return fused[:limit] if limit is not None else fused
+
+
+def hybrid_results(collection, vector_results: dict, lexical: list, k: int = 5) -> dict:
+    """Fuse a Chroma query result with BM25 hits into a Chroma-shaped result of `k` chunks.
+
+    Chunks found only lexically are fetched from the collection in one get()
+    call; their distance is None since the vector search never scored them.
+    """
+    vector_ids = vector_results["ids"][0] if vector_results.get("ids") else []
+    fused = [chunk_id for chunk_id, _ in
+             reciprocal_rank_fusion([vector_ids, [chunk_id for chunk_id, _ in lexical]], limit=k)]
+
+    found = {}
+    for i, chunk_id in enumerate(vector_ids):
+        found[chunk_id] = (vector_results["documents"][0][i], vector_results["metadatas"][0][i],
+                           vector_results["distances"][0][i])
+    missing = [chunk_id for chunk_id in fused if chunk_id not in found]
+    if missing:
+        fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+        for chunk_id, document, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+            found[chunk_id] = (document, metadata, None)
+
+    fused = [chunk_id for chunk_id in fused if chunk_id in found]
+    return {
+        "ids": [fused],
+        "documents": [[found[chunk_id][0] for chunk_id in fused]],
+        "metadatas": [[found[chunk_id][1] for chunk_id in fused]],
+        "distances": [[found[chunk_id][2] for chunk_id in fused]],
+    }
@@ -0,0 +1,250 @@
+"""Resumable bulk ingestion into rag_collection.
+
+Usage:
+    python bulk-ingest.py <file|directory|glob> [...] [--workers N] [--batch-size N]
+                          [--chars] [--prune] [--restart] [--no-dedup] [--root DIR]
+
+Finished files are recorded in the ingestion manifest and skipped on the next
+run while unchanged. Inside the file being ingested every written batch is
+checkpointed, so an interrupted run resumes from the last batch instead of
+from the start of the file. Pass --restart to ignore the batch checkpoint.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from initializedb import CHROMA_DB_PATH, initialize_db
+from processDocs import expand_paths
+from manifest import IngestionManifest, document_key, file_hash, remove_document
+from pipeline import stream_ingest_document
+from embedder import EmbeddingEngine
+from dedup import NearDuplicateIndex
+from bm25_index import rebuild_bm25_index
+
+CHECKPOINT_PATH = os.path.join(os.path.dirname(CHROMA_DB_PATH), "ingest_checkpoint.json")
+
+# Seconds between progress lines
+REPORT_INTERVAL = 5
+
+
+class IngestCheckpoint:
+    """Chunk ids already written for the file currently being ingested.
+
+    Line-oriented: the first line names the file version, and every written
+    batch appends one line with its ids, so checkpointing a batch costs the
+    batch and not everything written so far. A line torn by a crash is
+    dropped when the checkpoint is loaded; its batch is simply written again.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+        self.state = {}
+        self.written = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                lines = file.read().splitlines()
+            try:
+                header = json.loads(lines[0]) if lines else {}
+            except json.JSONDecodeError:
+                header = {}
+            self.state = {"file": header.get("file"), "file_hash": header.get("file_hash")}
+            self.written.update(header.get("written", []))
+            for line in lines[1:]:
+                try:
+                    self.written.update(json.loads(line))
+                except json.JSONDecodeError:
+                    # Rewrite without the torn tail so new batches are not appended to it
+                    self._rewrite()
+                    break
+
+    def written_ids(self, file_name: str, content_hash: str) -> set:
+        """Ids written by an interrupted run of this exact file version"""
+        if self.state.get("file") == file_name and self.state.get("file_hash") == content_hash:
+            return set(self.written)
+        return set()
+
+    def begin(self, file_name: str, content_hash: str):
+        if self.state.get("file") != file_name or self.state.get("file_hash") != content_hash:
+            self.state = {"file": file_name, "file_hash": content_hash}
+            self.written = set()
+            self._rewrite()
+
+    def add(self, ids: list):
+        self.written.update(ids)
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(list(ids)) + "\n")
+
+    def clear(self):
+        self.state = {}
+        self.written = set()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _rewrite(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(self.state) + "\n")
+            if self.written:
+                file.write(json.dumps(sorted(self.written)) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+class ProgressReporter:
+    """Running totals and throughput for a bulk ingestion run"""
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.totals = {
+            "files": 0, "ingested": 0, "skipped": 0, "failed": 0,
+            "chunks": 0, "embeddings": 0, "updated": 0, "deleted": 0, "duplicates": 0,
+        }
+
+    def on_write(self, kind: str, ids: list):
+        if kind == "add":
+            self.totals["embeddings"] += len(ids)
+        self.report()
+
+    def file_done(self, stats: dict):
+        self.totals["files"] += 1
+        if stats.get("skipped"):
+            self.totals["skipped"] += 1
+        else:
+            self.totals["ingested"] += 1
+            self.totals["chunks"] += (stats["added"] + stats["updated"] + stats["unchanged"]
+                                      + stats["resumed"] + stats["duplicates"])
+            self.totals["updated"] += stats["updated"]
+            self.totals["duplicates"] += stats["duplicates"]
+            self.totals["deleted"] += stats["deleted"]
+        self.report()
+
+    def file_failed(self):
+        self.totals["files"] += 1
+        self.totals["failed"] += 1
+
+    def rates(self) -> dict:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return {
+            "docs/s": self.totals["ingested"] / elapsed,
+            "chunks/s": self.totals["chunks"] / elapsed,
+            "embeddings/s": self.totals["embeddings"] / elapsed,
+        }
+
+    def report(self, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self.last_report < REPORT_INTERVAL:
+            return
+        self.last_report = now
+        rates = self.rates()
+        print(
+            f"[{now - self.start:7.1f}s] files {self.totals['files']}/{self.total_files}  "
+            f"docs/s {rates['docs/s']:.2f}  chunks/s {rates['chunks/s']:.1f}  "
+            f"embeddings/s {rates['embeddings/s']:.1f}",
+            flush=True,
+        )
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        rates = self.rates()
+        print("Ingestion summary:")
+        print(f"  files: {self.totals['files']}/{self.total_files} "
+              f"(ingested {self.totals['ingested']}, unchanged {self.totals['skipped']}, "
+              f"failed {self.totals['failed']})")
+        print(f"  chunks: {self.totals['chunks']} (embedded {self.totals['embeddings']}, "
+              f"moved {self.totals['updated']}, deleted {self.totals['deleted']}, "
+              f"near-duplicates dropped {self.totals['duplicates']})")
+        print(f"  elapsed: {elapsed:.1f}s  docs/s {rates['docs/s']:.2f}  "
+              f"chunks/s {rates['chunks/s']:.1f}  embeddings/s {rates['embeddings/s']:.1f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resumable bulk ingestion into rag_collection")
+    parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="embedding worker processes")
+    parser.add_argument("--batch-size", type=int, default=512, help="chunks per embedding batch")
+    parser.add_argument("--chars", action="store_true",
+                        help="use the 1000-character chunker instead of the token-budgeted one")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete documents from the collection that are not among the inputs")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the batch checkpoint of an interrupted run")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="store near-duplicate chunks instead of dropping them")
+    parser.add_argument("--root", default=None,
+                        help="documents are tracked by their path relative to this directory "
+                             "(default: the working directory)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    files = expand_paths(args.paths)
+    print(f"Found {len(files)} documents")
+
+    collection = initialize_db()
+    manifest = IngestionManifest()
+    checkpoint = IngestCheckpoint()
+    if args.restart:
+        checkpoint.clear()
+    progress = ProgressReporter(len(files))
+    dedup_index = None if args.no_dedup else NearDuplicateIndex()
+    if dedup_index is not None and not collection.count():
+        # Signatures left over from a wiped collection would drop the chunks being re-added
+        dedup_index.clear()
+    engine = EmbeddingEngine(workers=args.workers)
+
+    interrupted = False
+    try:
+        for file_path in files:
+            file_name = document_key(file_path, args.root)
+            try:
+                content_hash = file_hash(file_path)
+                resumed_ids = checkpoint.written_ids(file_name, content_hash)
+                if resumed_ids:
+                    print(f"Resuming {file_name}: {len(resumed_ids)} chunks already written")
+                checkpoint.begin(file_name, content_hash)
+
+                stats = stream_ingest_document(
+                    collection, manifest, file_path,
+                    batch_size=args.batch_size, embedding_function=engine, by_tokens=not args.chars,
+                    content_hash=content_hash, skip_ids=resumed_ids, dedup_index=dedup_index, root=args.root,
+                    on_write=lambda kind, ids: (checkpoint.add(ids), progress.on_write(kind, ids)),
+                )
+                checkpoint.clear()
+                progress.file_done(stats)
+            except Exception as e:
+                print(f"Error ingesting {file_path}: {str(e)}")
+                progress.file_failed()
+
+        if args.prune:
+            present = {document_key(file_path, args.root) for file_path in files}
+            for file_name in list(manifest.files):
+                if file_name not in present:
+                    removed = remove_document(collection, manifest, file_name, dedup_index=dedup_index)
+                    progress.totals["deleted"] += removed["deleted"]
+    except KeyboardInterrupt:
+        interrupted = True
+        print("Interrupted; re-run the same command to resume")
+    finally:
+        engine.close()
+
+    if progress.totals["ingested"] or progress.totals["deleted"]:
+        index = rebuild_bm25_index(collection)
+        print(f"BM25 index rebuilt: {len(index)} chunks, {len(index.vocabulary)} terms")
+
+    progress.report(force=True)
+    progress.summary()
+    if dedup_index is not None:
+        print(f"  dedup ratio: {dedup_index.dedup_ratio():.1%} of new chunks")
+    if interrupted:
+        sys.exit(130)
+    if progress.totals["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
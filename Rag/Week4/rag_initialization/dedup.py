@@ -0,0 +1,173 @@
+import os
+import pickle
+import re
+import zlib
+
+import numpy as np
+
+try:
+    from .initializedb import CHROMA_DB_PATH
+except ImportError:
+    from initializedb import CHROMA_DB_PATH
+
+DEDUP_INDEX_PATH = os.path.join(os.path.dirname(CHROMA_DB_PATH), "dedup_index.pkl")
+
+# 64 MinHash permutations split into 16 LSH bands of 4 rows: chunk pairs with
+# Jaccard similarity around 0.5 and up become candidates, which are then
+# checked against SIMILARITY_THRESHOLD on the full signature
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.85
+
+# Word n-grams compared between chunks
+SHINGLE_WORDS = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(42)
+_PERM_A = _rng.randint(1, 1 << 31, NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, NUM_PERM).astype(np.uint64)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature of a chunk's word shingles"""
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_WORDS:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64)
+
+    # One universal hash per permutation: (a * x + b) mod p, truncated to 32 bits
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return (permuted & 0xFFFFFFFF).min(axis=0).astype(np.uint32)
+
+
+def _band_keys(signature: np.ndarray) -> list:
+    return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+
+class NearDuplicateIndex:
+    """LSH index over the MinHash signatures of every chunk stored in the collection.
+
+    Dropped chunks are remembered as aliases of the chunk they duplicate, so
+    that when that chunk is deleted the documents holding its duplicates can
+    be re-ingested rather than silently losing the text.
+
+    Chunks indexed by `check` stay pending until `commit` confirms they were
+    written; `rollback` forgets pending chunks and aliases of a failed run,
+    so a retry does not find its own chunks already indexed.
+    """
+
+    def __init__(self, path: str = DEDUP_INDEX_PATH, threshold: float = SIMILARITY_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.signatures = {}
+        # dropped chunk id -> (kept chunk id, file name of the dropped chunk)
+        self.aliases = {}
+        self.buckets = {}
+        self.pending = set()
+        self.pending_aliases = set()
+        self.checked = 0
+        self.dropped = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                state = pickle.load(file)
+            self.signatures = state["signatures"]
+            self.aliases = state["aliases"]
+            for chunk_id, signature in self.signatures.items():
+                for key in _band_keys(signature):
+                    self.buckets.setdefault(key, set()).add(chunk_id)
+
+    def find_duplicate(self, signature: np.ndarray, exclude=(), chunk_id: str = None):
+        """Id of another indexed chunk whose estimated Jaccard similarity reaches the threshold"""
+        candidates = set()
+        for key in _band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+        candidates.difference_update(exclude)
+        # A chunk is never a duplicate of itself, e.g. when re-added after the collection was wiped
+        candidates.discard(chunk_id)
+        best_id, best_similarity = None, self.threshold
+        for chunk_id in candidates:
+            similarity = float(np.mean(self.signatures[chunk_id] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = chunk_id, similarity
+        return best_id
+
+    def check(self, chunk_id: str, text: str, file_name: str, exclude=()):
+        """Index a new chunk as pending, or return the id of the chunk it nearly duplicates.
+
+        `exclude` are ids never to match, such as the chunks of the previous
+        version of the same file: an edited chunk must replace its old
+        version, not be dropped as a duplicate of it.
+        """
+        self.checked += 1
+        signature = minhash_signature(text)
+        duplicate_of = self.find_duplicate(signature, exclude, chunk_id)
+        if duplicate_of is not None:
+            self.dropped += 1
+            self.aliases[chunk_id] = (duplicate_of, file_name)
+            self.pending_aliases.add(chunk_id)
+            return duplicate_of
+        self.signatures[chunk_id] = signature
+        for key in _band_keys(signature):
+            self.buckets.setdefault(key, set()).add(chunk_id)
+        self.pending.add(chunk_id)
+        return None
+
+    def clear(self):
+        """Forget every chunk, for a collection that was emptied or rebuilt"""
+        self.signatures, self.aliases, self.buckets = {}, {}, {}
+        self.pending, self.pending_aliases = set(), set()
+
+    def commit(self, ids=None):
+        """Confirm pending chunks as written; without ids, the whole run including its aliases"""
+        if ids is None:
+            self.pending.clear()
+            self.pending_aliases.clear()
+        else:
+            self.pending.difference_update(ids)
+
+    def rollback(self):
+        """Forget the chunks and aliases of a run that failed before writing them"""
+        for chunk_id in self.pending_aliases:
+            self.aliases.pop(chunk_id, None)
+        self._forget(self.pending)
+        self.pending = set()
+        self.pending_aliases = set()
+
+    def _forget(self, ids):
+        for chunk_id in ids:
+            signature = self.signatures.pop(chunk_id, None)
+            if signature is None:
+                continue
+            for key in _band_keys(signature):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(chunk_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def remove(self, ids) -> dict:
+        """Forget deleted chunks, returning {file name: [ids]} of dropped duplicates left without a kept copy"""
+        ids = set(ids)
+        for chunk_id in ids:
+            self.aliases.pop(chunk_id, None)
+        self._forget(ids)
+
+        orphaned = {}
+        for alias_id, (kept_id, file_name) in list(self.aliases.items()):
+            if kept_id in ids:
+                del self.aliases[alias_id]
+                orphaned.setdefault(file_name, []).append(alias_id)
+        return orphaned
+
+    def dedup_ratio(self) -> float:
+        """Share of checked chunks dropped as near-duplicates"""
+        return self.dropped / self.checked if self.checked else 0.0
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({"signatures": self.signatures, "aliases": self.aliases}, file)
+        os.replace(tmp_path, self.path)
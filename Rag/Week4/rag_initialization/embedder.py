@@ -0,0 +1,132 @@
+import numpy as np
+
+try:
+    from .embedding_cache import EmbeddingCache
+    from .initializedb import EMBEDDING_MODEL_NAME
+except ImportError:
+    from embedding_cache import EmbeddingCache
+    from initializedb import EMBEDDING_MODEL_NAME
+
+# Rough activation footprint of one token in one forward pass of a MiniLM-sized
+# model (hidden size x layers x attention/FFN intermediates x float32)
+BYTES_PER_TOKEN = 384 * 6 * 16 * 4
+
+# Share of currently available memory a single batch may use
+MEMORY_FRACTION = 0.25
+
+MIN_BATCH_SIZE = 8
+MAX_BATCH_SIZE = 512
+
+
+def available_memory_bytes() -> int:
+    """Memory the OS reports as available, falling back to 2 GiB if unknown"""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        return 2 * 1024 ** 3
+
+
+class EmbeddingEngine:
+    """CPU embedding stage for ingestion.
+
+    Texts are sorted by token length and cut into batches of similar length so
+    little compute is spent on padding; each batch is sized from the memory
+    currently available and the longest sequence in it. With `workers` > 1 the
+    batches are encoded by a pool of CPU worker processes. Instances are
+    callable like a Chroma embedding function and return vectors in input order.
+    Texts found in the embedding cache skip the model; pass use_cache=False to
+    always encode.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, workers: int = 1,
+                 max_batch_size: int = MAX_BATCH_SIZE, memory_fraction: float = MEMORY_FRACTION,
+                 use_cache: bool = True):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.max_batch_size = max_batch_size
+        self.memory_fraction = memory_fraction
+        self.cache = EmbeddingCache(model_name) if use_cache else None
+        self.pool = None
+        if workers > 1:
+            self.pool = self.model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+    def token_lengths(self, texts: list) -> list:
+        """Token count of each text as the model will see it (after truncation)"""
+        encoded = self.model.tokenizer(
+            texts, add_special_tokens=True, truncation=True, max_length=self.model.max_seq_length
+        )
+        return [len(input_ids) for input_ids in encoded["input_ids"]]
+
+    def batch_size_for(self, sequence_length: int, budget: float = None) -> int:
+        """Largest batch of `sequence_length`-token inputs that fits the memory budget"""
+        if budget is None:
+            budget = available_memory_bytes() * self.memory_fraction
+        batch_size = int(budget // (max(sequence_length, 1) * BYTES_PER_TOKEN))
+        return max(MIN_BATCH_SIZE, min(self.max_batch_size, batch_size))
+
+    def batches(self, texts: list) -> list:
+        """Group text indices into batches of similar token length, shortest first"""
+        lengths = self.token_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        budget = available_memory_bytes() * self.memory_fraction
+
+        batches = []
+        current = []
+        for i in order:
+            # Lengths only grow, so the newest item decides how many inputs fit
+            if current and len(current) >= self.batch_size_for(lengths[i], budget):
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+
+    def encode(self, texts: list) -> np.ndarray:
+        """Embed texts, returning a float32 matrix whose rows follow the input order"""
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        embeddings = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        for indices in self.batches(texts):
+            batch = [texts[i] for i in indices]
+            if self.pool is not None:
+                # Spread the batch across the worker processes in equal slices
+                workers = len(self.pool["processes"])
+                vectors = self.model.encode_multi_process(
+                    batch, self.pool, batch_size=max(1, len(batch) // workers),
+                    chunk_size=max(1, -(-len(batch) // workers)),
+                )
+            else:
+                vectors = self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True)
+            embeddings[indices] = vectors
+        return embeddings
+
+    def __call__(self, input):
+        texts = list(input)
+        if self.cache is None:
+            return [vector.tolist() for vector in self.encode(texts)]
+
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.encode([texts[i] for i in missing])
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
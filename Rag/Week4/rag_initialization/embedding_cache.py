@@ -0,0 +1,185 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Shared by every process that embeds with the same model (ingestion and query servers)
+CACHE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "embedding_cache")
+)
+
+# Vectors kept decoded in memory per cache; everything else is read from the memory map
+MEMORY_ITEMS = 10000
+
+INITIAL_ROWS = 1024
+
+
+def text_key(text: str) -> int:
+    """64-bit hash of a text, the per-model cache key"""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class EmbeddingCache:
+    """Persistent embedding cache for one model.
+
+    On disk, per model:
+        <model>.f32   float32 matrix of vectors, memory-mapped, grown by doubling
+        <model>.idx   uint64 text hashes, one per row of the matrix, append-only
+        <model>.json  vector dimension
+    Row i of the matrix belongs to the i-th hash in the index, so the index is
+    only 8 bytes per entry. Appends are serialised across processes with a file
+    lock, and readers pick up rows written by other processes on a miss. Hot
+    vectors are also kept in an in-memory LRU of `memory_items` entries.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = CACHE_DIR, memory_items: int = MEMORY_ITEMS):
+        os.makedirs(cache_dir, exist_ok=True)
+        base = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', model_name))
+        self.vectors_path = f"{base}.f32"
+        self.index_path = f"{base}.idx"
+        self.meta_path = f"{base}.json"
+        self.lock_path = f"{base}.lock"
+
+        self.dim = None
+        self.vectors = None
+        self.slots = {}
+        self.memory = OrderedDict()
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def _refresh(self):
+        """Load index entries and vector rows appended since the last refresh"""
+        if self.dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path) as meta:
+                self.dim = json.load(meta)["dim"]
+        if self.dim is None or not os.path.exists(self.index_path):
+            return
+
+        with open(self.index_path, 'rb') as index:
+            index.seek(len(self.slots) * 8)
+            data = index.read()
+        new_keys = np.frombuffer(data[:len(data) - len(data) % 8], dtype=np.uint64)
+        for key in new_keys.tolist():
+            self.slots.setdefault(key, len(self.slots))
+
+        rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+        if self.vectors is None or self.vectors.shape[0] != rows:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(rows, self.dim))
+
+    def _ensure_rows(self, rows: int):
+        """Grow the vector file (by doubling) until it holds at least `rows` rows"""
+        capacity = self.vectors.shape[0] if self.vectors is not None else 0
+        if rows <= capacity:
+            return
+        capacity = max(capacity, INITIAL_ROWS)
+        while capacity < rows:
+            capacity *= 2
+        if self.vectors is not None:
+            self.vectors.flush()
+        with open(self.vectors_path, 'ab') as vectors:
+            vectors.truncate(capacity * self.dim * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    def _remember(self, key: int, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, key: int):
+        vector = self.memory.get(key)
+        if vector is not None:
+            self.memory.move_to_end(key)
+            return vector
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        vector = np.array(self.vectors[slot])
+        self._remember(key, vector)
+        return vector
+
+    def get_many(self, texts: list) -> list:
+        """Cached vector for each text, or None where the text has not been embedded"""
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            vectors = [self._lookup(key) for key in keys]
+            if any(vector is None for vector in vectors):
+                # Another process may have embedded these since we last looked
+                self._refresh()
+                vectors = [vector if vector is not None else self._lookup(key)
+                           for key, vector in zip(keys, vectors)]
+            found = sum(vector is not None for vector in vectors)
+            self.hits += found
+            self.misses += len(vectors) - found
+        return vectors
+
+    def put_many(self, texts: list, vectors):
+        """Store vectors for texts, skipping texts that are already cached"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        keys = [text_key(text) for text in texts]
+
+        with self._lock, open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if self.dim is None and not os.path.exists(self.meta_path):
+                with open(self.meta_path, 'w') as meta:
+                    json.dump({"dim": int(vectors.shape[1])}, meta)
+            self._refresh()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.slots and key not in new_rows:
+                    new_rows[key] = vector
+            if new_rows:
+                start = len(self.slots)
+                self._ensure_rows(start + len(new_rows))
+                self.vectors[start:start + len(new_rows)] = np.stack(list(new_rows.values()))
+                self.vectors.flush()
+                # Keys are appended only after their rows are on disk
+                with open(self.index_path, 'ab') as index:
+                    index.write(np.array(list(new_rows), dtype=np.uint64).tobytes())
+                for key in new_rows:
+                    self.slots[key] = len(self.slots)
+
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.slots),
+            "memory_entries": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class CachedEmbeddingFunction:
+    """Chroma embedding function that only runs the model for texts not in the cache"""
+
+    def __init__(self, embedding_function, model_name: str, cache: EmbeddingCache = None):
+        self.embedding_function = embedding_function
+        self.cache = cache or EmbeddingCache(model_name)
+
+    def __call__(self, input):
+        texts = list(input)
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = np.asarray(self.embedding_function([texts[i] for i in missing]), dtype=np.float32)
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
@@ -1,6 +1,10 @@
 # from processDocs import process_document
 from initializedb import initialize_db, add_to_collection
 from processDocs import process_document
+from manifest import IngestionManifest
+from pipeline import stream_ingest_document
+from embedder import EmbeddingEngine
+from bm25_index import rebuild_bm25_index
 import os
 
 def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list:
@@ -25,13 +29,21 @@ def main():
     try:
         collection = initialize_db()
         print("Collection initialized")
-        ids, chunks, metadatas = process_document("Employee Handbook 2025.pdf")
+        manifest = IngestionManifest()
+        # Length-bucketed embedding spread over half the cores
+        engine = EmbeddingEngine(workers=max(1, (os.cpu_count() or 2) // 2))
+        try:
+            # Parsing, embedding and writing overlap; only new or changed chunks are embedded
+            stats = stream_ingest_document(
+                collection, manifest, "Employee Handbook 2025.pdf",
+                batch_size=512, embedding_function=engine, by_tokens=True
+            )
+        finally:
+            engine.close()
         print("Documents processed")
-        print("IDs:", ids)
-        print("Chunks:", chunks)
-        print("Metadatas:", metadatas)
-        add_to_collection(collection, ids, chunks, metadatas)
-        print("Documents added to collection")
+        print("Ingestion stats:", stats)
+        index = rebuild_bm25_index(collection)
+        print(f"BM25 index rebuilt: {len(index)} chunks, {len(index.vocabulary)} terms")
         print("Collection count after ingestion:", collection.count())
     except Exception as e:
         print("Error during ingestion:", e)
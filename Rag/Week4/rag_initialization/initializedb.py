@@ -2,18 +2,56 @@ import os
 import chromadb
 from chromadb.utils import embedding_functions
 
+try:
+    from .embedding_cache import CachedEmbeddingFunction
+    from .vector_index import MemmapCollection
+except ImportError:
+    from embedding_cache import CachedEmbeddingFunction
+    from vector_index import MemmapCollection
+
 CHROMA_DB_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "chroma_db")
 )
 
-def initialize_db():
+# Bumped on every write to the collection; query caches compare against it
+GENERATION_PATH = os.path.join(os.path.dirname(CHROMA_DB_PATH), "ingest_generation")
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# "chroma" (default) or "memmap" for the quantized memory-mapped index in vector_index.py
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_PATH = os.path.join(os.path.dirname(CHROMA_DB_PATH), "vector_index")
+# Vector precision of the memmap backend: "int8" or "float16"
+VECTOR_QUANTIZATION = os.getenv("RAG_VECTOR_QUANTIZATION", "int8")
+
+_embedding_function = None
+
+def get_embedding_function():
+    """Return the process-wide sentence transformer embedding function, loading the model once.
+
+    It is backed by the on-disk embedding cache, so texts embedded before (by
+    a previous ingestion or an earlier query) never reach the model again.
+    """
+    global _embedding_function
+    if _embedding_function is None:
+        _embedding_function = CachedEmbeddingFunction(
+            embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL_NAME),
+            EMBEDDING_MODEL_NAME,
+        )
+    return _embedding_function
+
+def initialize_db(backend: str = None):
+    backend = backend or VECTOR_BACKEND
+    if backend == "memmap":
+        return MemmapCollection(VECTOR_INDEX_PATH, get_embedding_function(), VECTOR_QUANTIZATION)
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector backend: {backend}")
+
     # Initialize ChromaDB client with persistence
     client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
 
     # Configure sentence transformer embeddings
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="all-MiniLM-L6-v2"
-    )
+    sentence_transformer_ef = get_embedding_function()
 
     # Create or get existing collection
     collection = client.get_or_create_collection(
@@ -23,16 +61,99 @@ def initialize_db():
     return collection
 
 
-def add_to_collection(collection, ids, texts, metadatas):
-    """Add documents to collection in batches"""
+def add_to_collection(collection, ids, texts, metadatas, embedding_function=None):
+    """Add documents to collection in batches.
+
+    If `embedding_function` is given (e.g. an EmbeddingEngine) all texts are
+    embedded up front in one call and the vectors are passed to Chroma, instead
+    of Chroma embedding each write batch itself.
+    """
     if not texts:
         return
 
+    embeddings = embedding_function(texts) if embedding_function is not None else None
+
     batch_size = 100
     for i in range(0, len(texts), batch_size):
         end_idx = min(i + batch_size, len(texts))
-        collection.add(
+        # Upsert so re-ingesting an id replaces it instead of colliding
+        collection.upsert(
             documents=texts[i:end_idx],
             metadatas=metadatas[i:end_idx],
-            ids=ids[i:end_idx]
+            ids=ids[i:end_idx],
+            embeddings=embeddings[i:end_idx] if embeddings is not None else None
+        )
+    bump_generation()
+
+
+def sync_document_chunks(collection, ids, texts, metadatas, previous_ids=None, embedding_function=None):
+    """Bring a document's chunks in the collection in line with its latest version.
+
+    `previous_ids` are the ids stored for the document by the last ingestion.
+    New chunks are embedded and upserted, chunks that disappeared are deleted,
+    and chunks that only moved get a metadata update without re-embedding.
+    """
+    previous_ids = previous_ids or []
+    previous_positions = {chunk_id: i for i, chunk_id in enumerate(previous_ids)}
+    current = set(ids)
+
+    new_rows = [i for i, chunk_id in enumerate(ids) if chunk_id not in previous_positions]
+    moved_rows = [
+        i for i, chunk_id in enumerate(ids)
+        if chunk_id in previous_positions and previous_positions[chunk_id] != i
+    ]
+    removed_ids = [chunk_id for chunk_id in previous_ids if chunk_id not in current]
+
+    add_to_collection(
+        collection,
+        [ids[i] for i in new_rows],
+        [texts[i] for i in new_rows],
+        [metadatas[i] for i in new_rows],
+        embedding_function=embedding_function,
+    )
+
+    if moved_rows:
+        collection.update(
+            ids=[ids[i] for i in moved_rows],
+            metadatas=[metadatas[i] for i in moved_rows],
         )
+
+    if removed_ids:
+        collection.delete(ids=removed_ids)
+
+    if moved_rows or removed_ids:
+        bump_generation()
+
+    return {
+        "added": len(new_rows),
+        "updated": len(moved_rows),
+        "deleted": len(removed_ids),
+        "unchanged": len(ids) - len(new_rows) - len(moved_rows),
+    }
+
+
+def bump_generation():
+    """Advance the ingestion generation so query-side caches drop their entries"""
+    generation = current_generation() + 1
+    tmp_path = f"{GENERATION_PATH}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.write(str(generation))
+    os.replace(tmp_path, GENERATION_PATH)
+    return generation
+
+
+_generation_cache = (None, 0)
+
+def current_generation() -> int:
+    """Current ingestion generation; re-read only when the file changes"""
+    global _generation_cache
+    try:
+        stat = os.stat(GENERATION_PATH)
+    except FileNotFoundError:
+        return 0
+    # bump_generation replaces the file, so the inode changes on every bump
+    version = (stat.st_ino, stat.st_mtime_ns)
+    if _generation_cache[0] != version:
+        with open(GENERATION_PATH) as file:
+            _generation_cache = (version, int(file.read().strip() or 0))
+    return _generation_cache[1]
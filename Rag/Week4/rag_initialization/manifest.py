@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+
+try:
+    from .initializedb import CHROMA_DB_PATH, sync_document_chunks, bump_generation
+    from .processDocs import read_pages, split_pages, make_chunk_ids, chunk_hash
+except ImportError:
+    from initializedb import CHROMA_DB_PATH, sync_document_chunks, bump_generation
+    from processDocs import read_pages, split_pages, make_chunk_ids, chunk_hash
+
+# Kept next to chroma_db, so it survives wiping the database; an unchanged file
+# is only skipped once verify_stored finds its chunks still in the collection
+MANIFEST_PATH = os.path.join(os.path.dirname(CHROMA_DB_PATH), "ingest_manifest.json")
+
+
+def document_key(file_path: str, root: str = None) -> str:
+    """Name a document is tracked under: its path relative to `root` (default: the working directory).
+
+    It keys the manifest and prefixes chunk ids, so a/policy.pdf and
+    b/policy.pdf stay apart; a file directly in `root` is keyed by its bare
+    file name. Files outside `root` are keyed by their absolute path.
+    """
+    path = os.path.abspath(file_path)
+    try:
+        relative = os.path.relpath(path, os.path.abspath(root or os.getcwd()))
+    except ValueError:
+        # Different drive on Windows
+        relative = os.pardir
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        relative = path
+    return relative.replace(os.sep, "/")
+
+
+def file_hash(file_path: str) -> str:
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """Record of what has been ingested: file content hash plus per-chunk text hashes.
+
+    Layout on disk:
+        {"files": {"<file name>": {"file_hash": "...", "chunks": {"<chunk id>": "<text hash>", ...},
+                                   "aliases": {"<chunk id>": "<text hash>", ...}}}}
+    Chunk order in the "chunks" mapping is the chunk order within the document.
+    "aliases" are chunks dropped as near-duplicates, which are not stored.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.files = json.load(file).get("files", {})
+
+    def is_unchanged(self, file_name: str, content_hash: str) -> bool:
+        entry = self.files.get(file_name)
+        return entry is not None and entry["file_hash"] == content_hash
+
+    def chunk_ids(self, file_name: str) -> list:
+        entry = self.files.get(file_name)
+        return list(entry["chunks"]) if entry else []
+
+    def alias_ids(self, file_name: str) -> list:
+        entry = self.files.get(file_name)
+        return list(entry.get("aliases", {})) if entry else []
+
+    def record(self, file_name: str, content_hash: str, chunk_hashes: dict, alias_hashes: dict = None):
+        """Store a document's content hash, its stored {chunk id: text hash} in document order
+        and the chunks dropped as near-duplicates"""
+        self.files[file_name] = {"file_hash": content_hash, "chunks": dict(chunk_hashes),
+                                 "aliases": dict(alias_hashes or {})}
+
+    def invalidate_chunks(self, file_name: str, ids: list):
+        """Mark chunks as not stored, so the next ingestion of the file re-adds them"""
+        entry = self.files.get(file_name)
+        if entry is None:
+            return
+        for chunk_id in ids:
+            entry["chunks"].pop(chunk_id, None)
+            entry.get("aliases", {}).pop(chunk_id, None)
+        # Force the file to be re-ingested even though its content is unchanged
+        entry["file_hash"] = None
+
+    def verify_stored(self, collection, file_name: str) -> bool:
+        """Check the file's chunks are still in the collection.
+
+        Missing chunks (the database was wiped or rebuilt) are invalidated,
+        so the next ingestion of the file adds them again.
+        """
+        ids = self.chunk_ids(file_name)
+        if not ids:
+            return True
+        stored = set(collection.get(ids=ids, include=[])["ids"])
+        missing = [chunk_id for chunk_id in ids if chunk_id not in stored]
+        if missing:
+            self.invalidate_chunks(file_name, missing)
+            return False
+        return True
+
+    def forget(self, file_name: str):
+        self.files.pop(file_name, None)
+
+    def save(self):
+        # Write to a temporary file first so a crash never leaves a truncated manifest
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({"files": self.files}, file)
+        os.replace(tmp_path, self.path)
+
+
+def ingest_document(collection, manifest: IngestionManifest, file_path: str, by_tokens: bool = False,
+                    embedding_function=None, root: str = None):
+    """Incrementally ingest one document, embedding only chunks that are new.
+
+    Returns a stats dict with the number of chunks added, updated, deleted
+    and left unchanged, or {"skipped": True} if the file itself is unchanged.
+    The document is tracked under document_key(file_path, root).
+    """
+    file_name = document_key(file_path, root)
+    content_hash = file_hash(file_path)
+    if manifest.is_unchanged(file_name, content_hash) and manifest.verify_stored(collection, file_name):
+        return {"skipped": True}
+
+    # Chunk page by page so an edit only changes the chunks of the pages it touches
+    chunks, page_numbers = split_pages(read_pages(file_path), by_tokens=by_tokens)
+    ids = make_chunk_ids(file_name, chunks)
+    metadatas = [
+        {"source": file_name, "chunk": i, "page": page_number}
+        for i, page_number in enumerate(page_numbers)
+    ]
+
+    stats = sync_document_chunks(
+        collection, ids, chunks, metadatas, previous_ids=manifest.chunk_ids(file_name),
+        embedding_function=embedding_function,
+    )
+    manifest.record(
+        file_name, content_hash, {chunk_id: chunk_hash(chunk) for chunk_id, chunk in zip(ids, chunks)}
+    )
+    manifest.save()
+    return stats
+
+
+def remove_document(collection, manifest: IngestionManifest, file_name: str, dedup_index=None):
+    """Delete every chunk of a document that is no longer part of the corpus"""
+    ids = manifest.chunk_ids(file_name)
+    alias_ids = manifest.alias_ids(file_name)
+    if ids:
+        collection.delete(ids=ids)
+        bump_generation()
+    manifest.forget(file_name)
+    if dedup_index is not None:
+        release_duplicates(manifest, dedup_index, ids + alias_ids)
+    manifest.save()
+    return {"deleted": len(ids)}
+
+
+def release_duplicates(manifest: IngestionManifest, dedup_index, deleted_ids: list):
+    """Schedule re-ingestion of near-duplicates whose kept copy was deleted"""
+    orphaned = dedup_index.remove(deleted_ids)
+    for file_name, ids in orphaned.items():
+        manifest.invalidate_chunks(file_name, ids)
+    dedup_index.save()
+    return orphaned
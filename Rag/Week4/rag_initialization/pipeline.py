@@ -0,0 +1,217 @@
+import queue
+import threading
+
+try:
+    from .initializedb import get_embedding_function, bump_generation
+    from .manifest import IngestionManifest, document_key, file_hash, release_duplicates
+    from .processDocs import iter_pages, iter_chunks, next_chunk_id, chunk_hash
+except ImportError:
+    from initializedb import get_embedding_function, bump_generation
+    from manifest import IngestionManifest, document_key, file_hash, release_duplicates
+    from processDocs import iter_pages, iter_chunks, next_chunk_id, chunk_hash
+
+# Chunks per embedding / write batch
+BATCH_SIZE = 64
+
+# Batches buffered between two stages; bounds memory regardless of document size
+QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+def _put(stage_queue, item, stop):
+    """Put an item, giving up if another stage failed and the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            stage_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(stage_queue, stop):
+    """Get the next item, or _DONE once the pipeline is stopping and nothing is left"""
+    while True:
+        try:
+            return stage_queue.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+def stream_ingest_document(collection, manifest: IngestionManifest, file_path: str,
+                           batch_size: int = BATCH_SIZE, queue_size: int = QUEUE_SIZE,
+                           embedding_function=None, by_tokens: bool = False,
+                           content_hash: str = None, skip_ids=None, on_write=None, dedup_index=None,
+                           root: str = None):
+    """Ingest a document through a streaming parse -> embed -> write pipeline.
+
+    Pages are parsed and chunked lazily in one thread, new chunks are embedded
+    in a second thread, and the calling thread writes to Chroma. The stages
+    are joined by bounded queues so they overlap and at most a few batches are
+    held in memory at any time. Like ingest_document, unchanged chunks are not
+    re-embedded, moved chunks only get a metadata update and chunks missing
+    from the new version are deleted. `by_tokens` switches to the token-budgeted
+    chunker so no chunk is truncated by the embedding model. The document is
+    tracked under document_key(file_path, root), which also prefixes its
+    chunk ids and is its "source" metadata.
+
+    For resuming an interrupted run, `skip_ids` are chunk ids already written
+    for this version of the file, and `on_write(kind, ids)` is called after
+    every batch the write stage commits ("add" or "update").
+
+    With a NearDuplicateIndex as `dedup_index`, new chunks that nearly
+    duplicate a chunk already stored (in any document) are dropped before
+    embedding and counted in stats["duplicates"]. The file's own previous
+    chunks are not matched, so edits replace them, and chunks only stay in
+    the index once written.
+    """
+    file_name = document_key(file_path, root)
+    content_hash = content_hash or file_hash(file_path)
+    if manifest.is_unchanged(file_name, content_hash) and manifest.verify_stored(collection, file_name):
+        return {"skipped": True}
+
+    embedding_function = embedding_function or get_embedding_function()
+    previous_ids = manifest.chunk_ids(file_name)
+    previous_positions = {chunk_id: i for i, chunk_id in enumerate(previous_ids)}
+    skip_ids = skip_ids or set()
+
+    to_embed = queue.Queue(maxsize=queue_size)
+    to_write = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    # Only the hashes are kept for the manifest, never the chunk texts. Chunks
+    # dropped as near-duplicates are never stored and are recorded apart.
+    chunk_hashes = {}
+    alias_hashes = {}
+
+    def parse_stage():
+        try:
+            new_rows, moved_rows = [], []
+            seen = {}
+            # Position among the stored chunks, so dropped duplicates never shift it
+            position = 0
+            for chunk, page_number in iter_chunks(iter_pages(file_path), by_tokens=by_tokens):
+                chunk_id = next_chunk_id(file_name, chunk, seen)
+                previous_position = previous_positions.get(chunk_id)
+                if previous_position is None and chunk_id not in skip_ids and dedup_index is not None \
+                        and dedup_index.check(chunk_id, chunk, file_name, exclude=previous_positions) is not None:
+                    alias_hashes[chunk_id] = chunk_hash(chunk)
+                    continue
+                chunk_hashes[chunk_id] = chunk_hash(chunk)
+                metadata = {"source": file_name, "chunk": position, "page": page_number}
+                position += 1
+
+                if chunk_id in skip_ids:
+                    # Written by the interrupted run this one resumes
+                    continue
+                if previous_position is None:
+                    new_rows.append((chunk_id, chunk, metadata))
+                elif previous_position != metadata["chunk"]:
+                    moved_rows.append((chunk_id, metadata))
+
+                if len(new_rows) >= batch_size:
+                    if not _put(to_embed, ("add", new_rows), stop):
+                        return
+                    new_rows = []
+                if len(moved_rows) >= batch_size:
+                    if not _put(to_embed, ("update", moved_rows), stop):
+                        return
+                    moved_rows = []
+
+            if new_rows:
+                _put(to_embed, ("add", new_rows), stop)
+            if moved_rows:
+                _put(to_embed, ("update", moved_rows), stop)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(to_embed, _DONE, stop)
+
+    def embed_stage():
+        try:
+            while True:
+                item = _get(to_embed, stop)
+                if item is _DONE:
+                    break
+                kind, rows = item
+                if kind == "add":
+                    embeddings = embedding_function([chunk for _, chunk, _ in rows])
+                    item = (kind, rows, embeddings)
+                if not _put(to_write, item, stop):
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(to_write, _DONE, stop)
+
+    workers = [
+        threading.Thread(target=parse_stage, name="ingest-parse", daemon=True),
+        threading.Thread(target=embed_stage, name="ingest-embed", daemon=True),
+    ]
+    for worker in workers:
+        worker.start()
+
+    stats = {"added": 0, "updated": 0, "deleted": 0, "resumed": len(skip_ids)}
+    succeeded = False
+    try:
+        # Write stage runs on the calling thread
+        while True:
+            item = _get(to_write, stop)
+            if item is _DONE:
+                break
+            kind = item[0]
+            if kind == "add":
+                _, rows, embeddings = item
+                collection.upsert(
+                    ids=[chunk_id for chunk_id, _, _ in rows],
+                    documents=[chunk for _, chunk, _ in rows],
+                    metadatas=[metadata for _, _, metadata in rows],
+                    embeddings=embeddings,
+                )
+                stats["added"] += len(rows)
+                if dedup_index is not None:
+                    dedup_index.commit([chunk_id for chunk_id, _, _ in rows])
+            else:
+                _, rows = item
+                collection.update(
+                    ids=[chunk_id for chunk_id, _ in rows],
+                    metadatas=[metadata for _, metadata in rows],
+                )
+                stats["updated"] += len(rows)
+            if on_write is not None:
+                on_write(kind, [row[0] for row in rows])
+        succeeded = True
+    finally:
+        # Unblocks the workers on any exit, including KeyboardInterrupt, so the joins cannot hang
+        stop.set()
+        for worker in workers:
+            worker.join()
+        if errors or not succeeded:
+            if dedup_index is not None:
+                # Chunks checked but never written must not match themselves on a retry
+                dedup_index.rollback()
+
+    if errors:
+        raise errors[0]
+
+    removed_ids = [chunk_id for chunk_id in previous_ids if chunk_id not in chunk_hashes]
+    if removed_ids:
+        collection.delete(ids=removed_ids)
+    stats["deleted"] = len(removed_ids)
+    stats["duplicates"] = len(alias_hashes)
+    if stats["added"] or stats["updated"] or stats["deleted"]:
+        bump_generation()
+    stats["unchanged"] = len(chunk_hashes) - stats["added"] - stats["updated"] - len(skip_ids)
+
+    # Aliases of the previous version that are gone no longer need their kept copy
+    stale_aliases = [chunk_id for chunk_id in manifest.alias_ids(file_name) if chunk_id not in alias_hashes]
+    manifest.record(file_name, content_hash, chunk_hashes, alias_hashes)
+    if dedup_index is not None:
+        dedup_index.commit()
+        release_duplicates(manifest, dedup_index, removed_ids + stale_aliases)
+    manifest.save()
+    return stats
@@ -1,18 +1,45 @@
-from docx import Document
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
 import PyPDF2
+import glob
+import hashlib
 import os
+import re
+import zipfile
 
-def read_document(file_path: str) -> str:
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx')
+
+# Number of PDF pages handed to a single worker task
+PAGES_PER_TASK = 25
+
+# WordprocessingML namespace used in word/document.xml
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# DOCX files have no pages; paragraphs are grouped into sections of roughly this
+# many characters, which the chunker then treats like pages
+DOCX_SECTION_CHARS = 4000
+
+# Tokenizer of the embedding model; all-MiniLM-L6-v2 truncates inputs past 256
+# word pieces, two of which are the [CLS] and [SEP] markers
+TOKENIZER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_CHUNK_TOKENS = 254
+
+# Positions where a new sentence or paragraph starts
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+def read_document(file_path: str, parallel: bool = False, max_workers: int = None) -> str:
     """Read content from a document file"""
     file_extension = os.path.splitext(file_path)[1].lower()
 
+    if parallel and file_extension == '.pdf':
+        # Split the PDF into page ranges and extract them in a process pool
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            return _collect_document(_submit_document(pool, file_path, PAGES_PER_TASK))
+
     if file_extension == '.docx':
-        # Read Word document
-        doc = Document(file_path)
-        content = []
-        for paragraph in doc.paragraphs:
-            content.append(paragraph.text)
-        return '\n'.join(content)
+        return _read_docx(file_path)
 
     elif file_extension == '.pdf':
         # Read PDF document
@@ -26,11 +53,190 @@ def read_document(file_path: str) -> str:
     else:
         raise ValueError(f"Unsupported file format: {file_extension}")
 
+def iter_pages(file_path: str):
+    """Yield a document's page texts one at a time (DOCX files yield sections instead of pages)"""
+    file_extension = os.path.splitext(file_path)[1].lower()
+
+    if file_extension == '.docx':
+        yield from iter_docx_sections(file_path)
+
+    elif file_extension == '.pdf':
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page in pdf_reader.pages:
+                yield page.extract_text() or ""
+
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+def read_pages(file_path: str) -> list:
+    """Read a document as a list of page texts"""
+    return list(iter_pages(file_path))
+
+def _read_docx(file_path: str) -> str:
+    """Read a Word document"""
+    return '\n'.join(iter_docx_blocks(file_path))
+
+def _paragraph_text(paragraph) -> str:
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == W_NS + 't' and node.text:
+            parts.append(node.text)
+        elif node.tag == W_NS + 'tab':
+            parts.append('\t')
+        elif node.tag in (W_NS + 'br', W_NS + 'cr'):
+            parts.append('\n')
+    return ''.join(parts)
+
+def iter_docx_blocks(file_path: str):
+    """Yield the text of each body paragraph and each table cell of a DOCX file, in order.
+
+    word/document.xml is iterparsed straight from the zip archive and every
+    finished block is cleared from the tree, so memory stays proportional to
+    one block rather than to the whole document.
+    """
+    with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as xml:
+        stack = []
+        cell_depth = 0
+        cell_paragraphs = []
+        for event, element in ElementTree.iterparse(xml, events=('start', 'end')):
+            if event == 'start':
+                stack.append(element)
+                if element.tag == W_NS + 'tc':
+                    cell_depth += 1
+                continue
+
+            stack.pop()
+            if element.tag == W_NS + 'p':
+                text = _paragraph_text(element)
+                if cell_depth:
+                    cell_paragraphs.append(text)
+                else:
+                    yield text
+                element.clear()
+            elif element.tag == W_NS + 'tc':
+                cell_depth -= 1
+                # Nested tables end up inside the enclosing cell's text
+                if not cell_depth:
+                    yield '\n'.join(cell_paragraphs)
+                    cell_paragraphs = []
+                element.clear()
+
+            # Drop finished top-level blocks from the body so the tree stays small
+            if len(stack) >= 2 and stack[-1].tag == W_NS + 'body':
+                stack[-1].remove(element)
+
+def iter_docx_sections(file_path: str, section_chars: int = DOCX_SECTION_CHARS):
+    """Group DOCX blocks into sections of about `section_chars` characters.
+
+    A section closes after at least `section_chars` characters at a block
+    whose hash is divisible by 4 (or at four times the size), so boundaries
+    depend on content rather than on offsets and an edit only reshapes the
+    section it falls in.
+    """
+    blocks = []
+    length = 0
+    for block in iter_docx_blocks(file_path):
+        if not block.strip():
+            continue
+        blocks.append(block)
+        length += len(block) + 1
+        boundary = hashlib.blake2b(block.encode('utf-8'), digest_size=1).digest()[0] % 4 == 0
+        if length >= section_chars and (boundary or length >= 4 * section_chars):
+            yield '\n'.join(blocks)
+            blocks = []
+            length = 0
+    if blocks:
+        yield '\n'.join(blocks)
+
+def _read_pdf_pages(file_path: str, start: int, end: int) -> list:
+    """Extract the text of pages [start, end) of a PDF (runs in a worker process)"""
+    content = []
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_number in range(start, end):
+            content.append(pdf_reader.pages[page_number].extract_text() or "")
+    return content
+
+def _count_pdf_pages(file_path: str) -> int:
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def expand_paths(paths) -> list:
+    """Expand files, directories and glob patterns into a sorted list of supported files"""
+    if isinstance(paths, str):
+        paths = [paths]
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names)
+        elif glob.has_magic(path):
+            files.extend(glob.glob(path, recursive=True))
+        else:
+            files.append(path)
+
+    supported = [f for f in files if os.path.splitext(f)[1].lower() in SUPPORTED_EXTENSIONS]
+    # dict.fromkeys keeps the first occurrence of each file
+    return sorted(dict.fromkeys(supported))
+
+def _submit_document(pool, file_path: str, pages_per_task: int) -> list:
+    """Queue the extraction tasks for one document, one task per PDF page range"""
+    if os.path.splitext(file_path)[1].lower() != '.pdf':
+        return [pool.submit(_read_docx, file_path)]
+
+    page_count = _count_pdf_pages(file_path)
+    return [
+        pool.submit(_read_pdf_pages, file_path, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+def _collect_document(futures: list) -> str:
+    """Join task results in submission order so pages stay in document order"""
+    parts = []
+    for future in futures:
+        result = future.result()
+        if isinstance(result, list):
+            parts.extend(result)
+        else:
+            parts.append(result)
+    return '\n'.join(parts)
+
+def read_documents(paths, max_workers: int = None, pages_per_task: int = PAGES_PER_TASK) -> list:
+    """Read many documents in parallel, returning [(file_path, content), ...] in path order.
+
+    PDFs are split into page ranges of `pages_per_task` pages and every range
+    (and every DOCX file) becomes one task in a shared process pool, so both a
+    single large PDF and a directory of small files keep all cores busy.
+    Files that fail to read are reported and skipped.
+    """
+    files = expand_paths(paths)
+    if not files:
+        return []
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        # Submit everything up front so workers never wait on the next file
+        tasks = []
+        for file_path in files:
+            try:
+                tasks.append((file_path, _submit_document(pool, file_path, pages_per_task)))
+            except Exception as e:
+                print(f"Error reading {file_path}: {str(e)}")
+
+        documents = []
+        for file_path, futures in tasks:
+            try:
+                documents.append((file_path, _collect_document(futures)))
+            except Exception as e:
+                print(f"Error reading {file_path}: {str(e)}")
+
+    return documents
+
 def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list:
     """Split text into chunks for processing"""
     if chunk_overlap >= chunk_size:
         raise ValueError("chunk_overlap must be smaller than chunk_size")
-    print(f"Chunk size: {chunk_size}, Chunk overlap: {chunk_overlap}")
     chunks = []
     start = 0
     text_length = len(text)
@@ -50,24 +256,158 @@ def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> l
 
     return [chunk.strip() for chunk in chunks if chunk.strip()]
 
-def process_document(file_path: str):
+_tokenizer = None
+
+def get_tokenizer():
+    """Load the embedding model's tokenizer once per process"""
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+        _tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+    return _tokenizer
+
+def _token_boundaries(pattern, text: str, token_starts: list) -> list:
+    """Token indices at which the matches of `pattern` end, i.e. where a new unit starts"""
+    boundaries = []
+    for match in pattern.finditer(text):
+        index = bisect_right(token_starts, match.end() - 1)
+        if 0 < index < len(token_starts) and (not boundaries or boundaries[-1] != index):
+            boundaries.append(index)
+    return boundaries
+
+def _last_boundary(boundaries: list, low: int, high: int):
+    """Largest boundary in (low, high], or None"""
+    i = bisect_right(boundaries, high) - 1
+    if i >= 0 and boundaries[i] > low:
+        return boundaries[i]
+    return None
+
+def split_text_by_tokens(text: str, max_tokens: int = MAX_CHUNK_TOKENS, overlap_tokens: int = 32,
+                         tokenizer=None) -> list:
+    """Split text into chunks that fit the embedding model's token window.
+
+    The text is tokenized once; chunk ends are then picked in a single pass
+    over token positions, snapping each end back to the last paragraph break
+    (if it keeps the chunk at least half full), else the last sentence break,
+    else the last word break inside the window. The next chunk starts at a
+    sentence break within `overlap_tokens` of the previous end, or right at
+    the end when there is none.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    tokenizer = tokenizer or get_tokenizer()
+    offsets = tokenizer(
+        text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+    )["offset_mapping"]
+    if not offsets:
+        return []
+
+    token_starts = [start for start, _ in offsets]
+    paragraphs = _token_boundaries(PARAGRAPH_BREAK, text, token_starts)
+    sentences = sorted(set(paragraphs + _token_boundaries(SENTENCE_BREAK, text, token_starts)))
+    # Word breaks: tokens separated from the previous one by whitespace (not word-piece continuations)
+    words = [i for i in range(1, len(offsets)) if offsets[i][0] > offsets[i - 1][1]]
+
+    chunks = []
+    start = 0
+    token_count = len(offsets)
+    while start < token_count:
+        limit = start + max_tokens
+        if limit >= token_count:
+            end = token_count
+        else:
+            end = _last_boundary(paragraphs, start + max_tokens // 2, limit)
+            if end is None:
+                end = _last_boundary(sentences, start, limit)
+            if end is None:
+                end = _last_boundary(words, start, limit) or limit
+
+        chunk = text[offsets[start][0]:offsets[end - 1][1]].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= token_count:
+            break
+
+        overlap_start = _last_boundary(sentences, max(start, end - overlap_tokens - 1), end - 1)
+        start = overlap_start if overlap_start is not None else end
+
+    return chunks
+
+def split_pages(pages: list, chunk_size: int = 1000, chunk_overlap: int = 200, by_tokens: bool = False):
+    """Split each page on its own so chunk boundaries restart at every page.
+
+    An edit then only changes the chunks of the pages it touches, instead of
+    shifting every chunk boundary after it. Returns (chunks, page_numbers).
+    """
+    chunks, page_numbers = [], []
+    for chunk, page_number in iter_chunks(pages, chunk_size, chunk_overlap, by_tokens):
+        chunks.append(chunk)
+        page_numbers.append(page_number)
+    return chunks, page_numbers
+
+def iter_chunks(pages, chunk_size: int = 1000, chunk_overlap: int = 200, by_tokens: bool = False):
+    """Yield (chunk, page_number) pairs from an iterable of pages, one page in memory at a time.
+
+    With `by_tokens` the pages are split by split_text_by_tokens with its
+    model-window defaults and the character sizes are ignored.
+    """
+    for page_number, page in enumerate(pages):
+        page_chunks = split_text_by_tokens(page) if by_tokens else split_text(page, chunk_size, chunk_overlap)
+        for chunk in page_chunks:
+            yield chunk, page_number
+
+def chunk_hash(text: str) -> str:
+    """Hash of a chunk's text, used to recognise unchanged chunks across ingestions"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def make_chunk_ids(file_name: str, chunks: list) -> list:
+    """Build content-addressed chunk ids, stable as long as the chunk text is unchanged"""
+    seen = {}
+    return [next_chunk_id(file_name, chunk, seen) for chunk in chunks]
+
+def next_chunk_id(file_name: str, chunk: str, seen: dict) -> str:
+    """Content-addressed id for the next chunk of a document, `seen` tracks repeats"""
+    chunk_id = f"{file_name}_{chunk_hash(chunk)[:16]}"
+    # Identical chunks in one document get an occurrence suffix
+    seen[chunk_id] = seen.get(chunk_id, 0) + 1
+    if seen[chunk_id] > 1:
+        chunk_id = f"{chunk_id}_{seen[chunk_id] - 1}"
+    return chunk_id
+
+def _prepare_chunks(file_path: str, content: str):
+    """Split document content into chunks and build their ids and metadata"""
+    # Split into chunks
+    chunks = split_text(content)
+    print("Number of Chunks:", len(chunks))
+    print("First chunk:", chunks[0] if chunks else "No chunks")
+
+    # Prepare metadata
+    file_name = os.path.basename(file_path)
+    metadatas = [{"source": file_name, "chunk": i} for i in range(len(chunks))]
+    ids = make_chunk_ids(file_name, chunks)
+
+    return ids, chunks, metadatas
+
+def process_document(file_path: str, parallel: bool = False, max_workers: int = None):
     """Process a single document and prepare it for ChromaDB"""
     try:
         # Read the document
-        content = read_document(file_path)
+        content = read_document(file_path, parallel=parallel, max_workers=max_workers)
         print("Raw document content:", repr(content))
 
-        # Split into chunks
-        chunks = split_text(content)
-        print("Number of Chunks:", len(chunks))
-        print("First chunk:", chunks[0] if chunks else "No chunks")
-
-        # Prepare metadata
-        file_name = os.path.basename(file_path)
-        metadatas = [{"source": file_name, "chunk": i} for i in range(len(chunks))]
-        ids = [f"{file_name}_chunk_{i}" for i in range(len(chunks))]
-
-        return ids, chunks, metadatas
+        return _prepare_chunks(file_path, content)
     except Exception as e:
         print(f"Error processing {file_path}: {str(e)}")
         return [], [], []
+
+def process_documents(paths, max_workers: int = None):
+    """Process a directory, glob or list of documents in parallel and prepare them for ChromaDB"""
+    all_ids, all_chunks, all_metadatas = [], [], []
+
+    for file_path, content in read_documents(paths, max_workers=max_workers):
+        ids, chunks, metadatas = _prepare_chunks(file_path, content)
+        all_ids.extend(ids)
+        all_chunks.extend(chunks)
+        all_metadatas.extend(metadatas)
+
+    return all_ids, all_chunks, all_metadatas
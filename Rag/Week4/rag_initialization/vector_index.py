@@ -0,0 +1,520 @@
+import fcntl
+import io
+import os
+import pickle
+import threading
+
+import numpy as np
+
+# Rows scored per block during a brute-force scan; small enough that the
+# dequantized block stays in cache
+SCAN_BLOCK_ROWS = 4096
+
+# Candidates kept from the quantized scan per requested result, re-scored in float32
+RESCORE_FACTOR = 4
+
+# IVF partitioning is built once the index holds this many rows, and rebuilt
+# after it has grown by half; smaller indexes are scanned exhaustively
+IVF_MIN_ROWS = 50000
+IVF_REBUILD_GROWTH = 1.5
+IVF_TRAIN_ROWS = 20000
+IVF_ITERATIONS = 10
+# Lists probed per query, as a share of all lists (at least one)
+IVF_PROBE_FRACTION = 0.1
+
+# Tombstoned rows are compacted away once they make up this share of the files
+COMPACT_DEAD_FRACTION = 0.25
+
+INITIAL_ROWS = 1024
+
+QUANTIZATIONS = ("int8", "float16")
+
+
+class MemmapCollection:
+    """Vector index with the subset of Chroma's collection API the RAG code uses.
+
+    On disk, in `path`:
+        state.pkl           ids, live mask, row norms, int8 scales, the IVF
+                            partitioning and the committed size of the log
+        records-<n>.log     append-only log of documents and metadatas
+        vectors-<n>.f32     float32 vectors, memory-mapped, read only to
+                            re-score the best candidates exactly
+        vectors-<n>.q8/.f16 int8 (per-row scale) or float16 copy scanned
+                            with NumPy matrix products
+    Opening maps the files instead of reading them, so startup is near
+    instant and only the pages a query touches become resident. Updates
+    append new rows and tombstone the old ones; the files are rewritten
+    (under a new segment number <n>) once enough rows are dead. Writers
+    hold a file lock, and readers reload the state when it changes and
+    read only the log records added since. A write therefore costs the new
+    records plus the small per-row state, not the whole corpus text.
+    Distances are squared L2, like Chroma's default space.
+    """
+
+    def __init__(self, path: str, embedding_function=None, quantization: str = "int8"):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.state_path = os.path.join(path, "state.pkl")
+        self.lock_path = os.path.join(path, "index.lock")
+        self.embedding_function = embedding_function
+        self.quantization = quantization
+        self._lock = threading.RLock()
+        self._version = None
+        self._segment = None
+        self._log_offset = 0
+        self._pending_log = []
+        self.documents = []
+        self.metadatas = []
+        self.exact = None
+        self.approx = None
+        self._load()
+
+    # --- storage -------------------------------------------------------------
+
+    def _empty_state(self) -> dict:
+        return {
+            "quantization": self.quantization, "segment": 0, "dim": None, "rows": 0,
+            "ids": [], "log_size": 0,
+            "live": np.zeros(0, dtype=bool), "norms": np.zeros(0, dtype=np.float32),
+            "scales": np.zeros(0, dtype=np.float32), "ivf": None,
+        }
+
+    def _files(self, state: dict) -> tuple:
+        suffix = "q8" if state["quantization"] == "int8" else "f16"
+        return (os.path.join(self.path, f"vectors-{state['segment']}.f32"),
+                os.path.join(self.path, f"vectors-{state['segment']}.{suffix}"))
+
+    def _log_path(self, state: dict) -> str:
+        return os.path.join(self.path, f"records-{state['segment']}.log")
+
+    def _approx_dtype(self):
+        return np.int8 if self.state["quantization"] == "int8" else np.float16
+
+    def _map(self, mode: str = 'r'):
+        """Map the vector files; their capacity may exceed the rows in use"""
+        self.exact = self.approx = None
+        dim = self.state["dim"]
+        if dim is None:
+            return
+        exact_path, approx_path = self._files(self.state)
+        capacity = os.path.getsize(exact_path) // (dim * 4)
+        if capacity:
+            self.exact = np.memmap(exact_path, dtype=np.float32, mode=mode, shape=(capacity, dim))
+            self.approx = np.memmap(approx_path, dtype=self._approx_dtype(), mode=mode, shape=(capacity, dim))
+
+    def _load(self):
+        """(Re)load the state if another process has written since we last looked"""
+        try:
+            stat = os.stat(self.state_path)
+        except FileNotFoundError:
+            if self._version is None:
+                self.state = self._empty_state()
+                self.positions = {}
+                self._version = (None, None)
+            return
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._version:
+            return
+        with open(self.state_path, 'rb') as file:
+            self.state = pickle.load(file)
+        self.quantization = self.state["quantization"]
+        live = self.state["live"]
+        self.positions = {chunk_id: row for row, chunk_id in enumerate(self.state["ids"]) if live[row]}
+        self._read_log()
+        self._map()
+        self._version = version
+
+    def _read_log(self):
+        """Apply the log records committed since the last read (all of them after a compaction)"""
+        if self.state["segment"] != self._segment:
+            self._segment = self.state["segment"]
+            self._log_offset = 0
+            self.documents, self.metadatas = [], []
+        size = self.state["log_size"]
+        if size <= self._log_offset:
+            return
+        # Bytes past log_size belong to a write that never committed its state
+        with open(self._log_path(self.state), 'rb') as file:
+            file.seek(self._log_offset)
+            data = io.BytesIO(file.read(size - self._log_offset))
+        while data.tell() < len(data.getbuffer()):
+            self._apply(pickle.load(data))
+        self._log_offset = size
+
+    def _apply(self, record: tuple):
+        kind, rows, documents, metadatas = record
+        if kind == "put":
+            self.documents.extend(documents)
+            self.metadatas.extend(metadatas)
+        elif kind == "drop":
+            for row in rows:
+                self.documents[row] = self.metadatas[row] = None
+        else:
+            for row, metadata in zip(rows, metadatas):
+                self.metadatas[row] = metadata
+
+    def _record(self, kind: str, rows, documents=None, metadatas=None):
+        """Apply a change to the documents/metadatas and queue it for the log"""
+        record = (kind, rows, documents, metadatas)
+        self._apply(record)
+        self._pending_log.append(record)
+
+    def _save(self):
+        for array in (self.exact, self.approx):
+            if array is not None:
+                array.flush()
+        if self._pending_log:
+            with open(self._log_path(self.state), 'ab') as file:
+                file.truncate(self.state["log_size"])
+                for record in self._pending_log:
+                    pickle.dump(record, file, protocol=pickle.HIGHEST_PROTOCOL)
+                self.state["log_size"] = self._log_offset = file.tell()
+            self._pending_log = []
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(self.state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.state_path)
+        stat = os.stat(self.state_path)
+        self._version = (stat.st_ino, stat.st_mtime_ns)
+
+    def _ensure_rows(self, rows: int):
+        """Grow both vector files (by doubling) until they hold at least `rows` rows"""
+        capacity = self.exact.shape[0] if self.exact is not None else 0
+        if rows <= capacity:
+            return
+        capacity = max(capacity, INITIAL_ROWS)
+        while capacity < rows:
+            capacity *= 2
+        dim = self.state["dim"]
+        for file_path, itemsize in zip(self._files(self.state), (4, np.dtype(self._approx_dtype()).itemsize)):
+            with open(file_path, 'ab') as file:
+                file.truncate(capacity * dim * itemsize)
+        self._map('r+')
+
+    def _quantize(self, vectors: np.ndarray) -> tuple:
+        if self.state["quantization"] == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def _append(self, ids: list, documents: list, metadatas: list, vectors: np.ndarray):
+        state = self.state
+        if state["dim"] is None:
+            state["dim"] = int(vectors.shape[1])
+        start = state["rows"]
+        self._ensure_rows(start + len(ids))
+        if self.exact.mode != 'r+':
+            self._map('r+')
+        quantized, scales = self._quantize(vectors)
+        self.exact[start:start + len(ids)] = vectors
+        self.approx[start:start + len(ids)] = quantized
+
+        state["rows"] += len(ids)
+        state["ids"].extend(ids)
+        self._record("put", start, list(documents), list(metadatas))
+        state["live"] = np.concatenate([state["live"], np.ones(len(ids), dtype=bool)])
+        state["norms"] = np.concatenate([state["norms"], np.einsum('ij,ij->i', vectors, vectors)])
+        state["scales"] = np.concatenate([state["scales"], scales])
+        if state["ivf"] is not None:
+            assignments = _nearest_centroids(vectors, state["ivf"]["centroids"])
+            state["ivf"]["assignments"] = np.concatenate([state["ivf"]["assignments"], assignments])
+        for offset, chunk_id in enumerate(ids):
+            self.positions[chunk_id] = start + offset
+
+    def _tombstone(self, ids):
+        rows = []
+        for chunk_id in ids:
+            row = self.positions.pop(chunk_id, None)
+            if row is not None:
+                self.state["live"][row] = False
+                rows.append(row)
+        if rows:
+            self._record("drop", rows)
+
+    def _maintain(self):
+        """Compact dead rows and (re)build the IVF partitioning as the index grows"""
+        state = self.state
+        if state["rows"] and 1 - len(self.positions) / state["rows"] > COMPACT_DEAD_FRACTION:
+            self._compact()
+        ivf = state["ivf"]
+        if len(self.positions) >= IVF_MIN_ROWS and (
+                ivf is None or len(self.positions) >= ivf["trained_rows"] * IVF_REBUILD_GROWTH):
+            self._build_ivf()
+
+    def _compact(self):
+        """Rewrite the live rows into a new segment, dropping tombstones"""
+        old = self.state
+        rows = np.flatnonzero(old["live"][:old["rows"]])
+        old_exact, old_documents, old_metadatas = self.exact, self.documents, self.metadatas
+        new = self._empty_state()
+        new.update(quantization=old["quantization"], segment=old["segment"] + 1, dim=old["dim"])
+        old_files = self._files(old) + (self._log_path(old),)
+        self.state, self.positions, self.exact, self.approx = new, {}, None, None
+        # The new segment starts a new log holding only the live rows
+        self._segment, self._log_offset, self._pending_log = new["segment"], 0, []
+        self.documents, self.metadatas = [], []
+        for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+            block = rows[start:start + SCAN_BLOCK_ROWS]
+            self._append([old["ids"][row] for row in block], [old_documents[row] for row in block],
+                         [old_metadatas[row] for row in block], np.asarray(old_exact[block]))
+        if old["ivf"] is not None:
+            new["ivf"] = {**old["ivf"], "assignments": old["ivf"]["assignments"][rows]}
+        self._save()
+        # Readers that still map the old files keep them alive until they reload
+        for file_path in old_files:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _write(self, action):
+        """Run a mutation under the cross-process file lock against the latest state"""
+        with self._lock, open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._load()
+            try:
+                action()
+                self._maintain()
+                self._save()
+            except BaseException:
+                # Drop the half-applied change; the next access reloads what was committed
+                self._version = self._segment = None
+                self._pending_log = []
+                raise
+
+    def _embed(self, documents: list) -> np.ndarray:
+        if self.embedding_function is None:
+            raise ValueError("embeddings are required when the collection has no embedding function")
+        return np.asarray(self.embedding_function(documents), dtype=np.float32)
+
+    # --- Chroma-compatible API -----------------------------------------------
+
+    def count(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self.positions)
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        """Insert new ids; like Chroma, ids that already exist are ignored"""
+        with self._lock:
+            self._load()
+            keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in self.positions]
+        if not keep:
+            return
+        self.upsert(
+            ids=[ids[i] for i in keep],
+            documents=[documents[i] for i in keep] if documents is not None else None,
+            metadatas=[metadatas[i] for i in keep] if metadatas is not None else None,
+            embeddings=[embeddings[i] for i in keep] if embeddings is not None else None,
+        )
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        ids = list(ids)
+        if not ids:
+            return
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+        vectors = np.asarray(embeddings, dtype=np.float32) if embeddings is not None else self._embed(documents)
+
+        def action():
+            self._tombstone(ids)
+            self._append(ids, documents, metadatas, vectors)
+        self._write(action)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        """Update existing ids; metadata-only updates are applied in place"""
+        ids = list(ids)
+        if documents is not None or embeddings is not None:
+            with self._lock:
+                self._load()
+                current = [self.positions.get(chunk_id) for chunk_id in ids]
+            existing = [i for i, row in enumerate(current) if row is not None]
+            self.upsert(
+                ids=[ids[i] for i in existing],
+                documents=[documents[i] if documents is not None else self.documents[current[i]]
+                           for i in existing],
+                metadatas=[metadatas[i] if metadatas is not None else self.metadatas[current[i]]
+                           for i in existing],
+                embeddings=[embeddings[i] for i in existing] if embeddings is not None else None,
+            )
+            return
+
+        def action():
+            rows, updated = [], []
+            for chunk_id, metadata in zip(ids, metadatas or []):
+                row = self.positions.get(chunk_id)
+                if row is not None:
+                    rows.append(row)
+                    updated.append(metadata)
+            if rows:
+                self._record("meta", rows, metadatas=updated)
+        self._write(action)
+
+    def delete(self, ids):
+        self._write(lambda: self._tombstone(list(ids)))
+
+    def get(self, ids=None, include=("documents", "metadatas"), limit=None, offset=0):
+        with self._lock:
+            self._load()
+            if ids is None:
+                rows = sorted(self.positions.values())
+                rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            else:
+                rows = [self.positions[chunk_id] for chunk_id in ids if chunk_id in self.positions]
+            return self._rows_result(rows, include)
+
+    def query(self, query_texts=None, query_embeddings=None, n_results: int = 10,
+              include=("documents", "metadatas", "distances"), where: dict = None, use_ivf: bool = True):
+        """Nearest chunks per query; `where` supports Chroma's metadata operators
+        $eq, $ne, $in, $nin, $and and $or"""
+        queries = np.asarray(query_embeddings if query_embeddings is not None else self._embed(list(query_texts)),
+                             dtype=np.float32)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            self._load()
+            for rows, distances in self._search(queries, n_results, use_ivf, where):
+                single = self._rows_result(rows, include)
+                for key in ("ids", "documents", "metadatas"):
+                    results[key].append(single.get(key))
+                results["distances"].append(distances.tolist())
+        return {key: value for key, value in results.items() if key == "ids" or key in include}
+
+    def _rows_result(self, rows, include) -> dict:
+        result = {"ids": [self.state["ids"][row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [self.documents[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[row] for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = [np.array(self.exact[row]) for row in rows]
+        return result
+
+    # --- search ----------------------------------------------------------------
+
+    def _approx_distances(self, queries: np.ndarray, query_norms: np.ndarray, rows) -> np.ndarray:
+        """Squared L2 distances (queries x rows) from the quantized vectors, with exact row norms"""
+        dots = (queries @ self.approx[rows].astype(np.float32).T) * self.state["scales"][rows]
+        return query_norms[:, None] + self.state["norms"][rows] - 2 * dots
+
+    def _search(self, queries: np.ndarray, n_results: int, use_ivf: bool, where: dict = None) -> list:
+        """(rows, distances) of the nearest live rows matching `where` for each query"""
+        state = self.state
+        allowed = state["live"][:state["rows"]]
+        if where:
+            allowed = allowed.copy()
+            for row in np.flatnonzero(allowed):
+                allowed[row] = _matches(self.metadatas[row] or {}, where)
+        candidates = int(allowed.sum()) if where else len(self.positions)
+        if not candidates or state["dim"] is None:
+            return [([], np.zeros(0, dtype=np.float32)) for _ in queries]
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        keep = min(candidates, n_results * RESCORE_FACTOR)
+
+        if use_ivf and state["ivf"] is not None:
+            shortlists = [self._ivf_shortlist(query, norm, keep, allowed) for query, norm in zip(queries, query_norms)]
+        else:
+            shortlists = self._scan_shortlists(queries, query_norms, keep, allowed)
+
+        # Exact float32 re-scoring of each query's shortlist
+        results = []
+        for query, rows in zip(queries, shortlists):
+            rows = np.sort(rows)
+            exact = ((np.asarray(self.exact[rows]) - query) ** 2).sum(axis=1)
+            order = np.argsort(exact, kind="stable")[:n_results]
+            results.append((rows[order].tolist(), exact[order]))
+        return results
+
+    def _scan_shortlists(self, queries: np.ndarray, query_norms: np.ndarray, keep: int, allowed: np.ndarray) -> list:
+        """Brute-force scan of every row; all queries share one matrix product per block"""
+        state = self.state
+        candidate_rows, candidate_distances = [], []
+        for start in range(0, state["rows"], SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, state["rows"])
+            distances = self._approx_distances(queries, query_norms, slice(start, end))
+            distances[:, ~allowed[start:end]] = np.inf
+            # Keep only each block's best candidates so memory stays bounded
+            best = np.argpartition(distances, keep - 1, axis=1)[:, :keep] if end - start > keep else \
+                np.broadcast_to(np.arange(end - start), (len(queries), end - start))
+            candidate_rows.append(best + start)
+            candidate_distances.append(np.take_along_axis(distances, best, axis=1))
+        rows = np.concatenate(candidate_rows, axis=1)
+        distances = np.concatenate(candidate_distances, axis=1)
+        return [_best(row_ids, row_distances, keep) for row_ids, row_distances in zip(rows, distances)]
+
+    def _ivf_shortlist(self, query: np.ndarray, query_norm: float, keep: int, allowed: np.ndarray) -> np.ndarray:
+        """Approximate candidates from the rows of the IVF lists nearest to the query"""
+        state = self.state
+        ivf = state["ivf"]
+        centroids = ivf["centroids"]
+        probes = max(1, int(len(centroids) * IVF_PROBE_FRACTION))
+        lists = np.argpartition(((centroids - query) ** 2).sum(axis=1), probes - 1)[:probes]
+        rows = np.flatnonzero(np.isin(ivf["assignments"], lists) & allowed)
+        if not len(rows):
+            return rows
+        distances = np.concatenate([
+            self._approx_distances(query[None, :], np.array([query_norm]), rows[start:start + SCAN_BLOCK_ROWS])[0]
+            for start in range(0, len(rows), SCAN_BLOCK_ROWS)
+        ])
+        return _best(rows, distances, keep)
+
+    def build_ivf(self, lists: int = None):
+        """Partition the live rows into `lists` k-means clusters (default sqrt of the row count)"""
+        self._write(lambda: self._build_ivf(lists))
+
+    def _build_ivf(self, lists: int = None):
+        state = self.state
+        live_rows = np.flatnonzero(state["live"][:state["rows"]])
+        if not len(live_rows):
+            return
+        lists = lists or max(1, int(np.sqrt(len(live_rows))))
+        rng = np.random.RandomState(0)
+        sample = np.asarray(self.exact[np.sort(rng.choice(live_rows, min(IVF_TRAIN_ROWS, len(live_rows)), replace=False))])
+        centroids = sample[rng.choice(len(sample), min(lists, len(sample)), replace=False)].copy()
+        for _ in range(IVF_ITERATIONS):
+            assignments = _nearest_centroids(sample, centroids)
+            for cluster in range(len(centroids)):
+                members = sample[assignments == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+
+        assignments = np.zeros(state["rows"], dtype=np.int32)
+        for start in range(0, state["rows"], SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, state["rows"])
+            assignments[start:end] = _nearest_centroids(np.asarray(self.exact[start:end]), centroids)
+        state["ivf"] = {"centroids": centroids, "assignments": assignments, "trained_rows": len(live_rows)}
+
+
+def _matches(metadata: dict, where: dict) -> bool:
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand or operator == "$ne" and value == operand \
+                        or operator == "$in" and value not in operand or operator == "$nin" and value in operand:
+                    return False
+                if operator not in ("$eq", "$ne", "$in", "$nin"):
+                    raise ValueError(f"Unsupported where operator: {operator}")
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _best(rows: np.ndarray, distances: np.ndarray, keep: int) -> np.ndarray:
+    """The (at most) `keep` rows with the smallest finite distances"""
+    finite = np.isfinite(distances)
+    rows, distances = rows[finite], distances[finite]
+    if len(rows) > keep:
+        rows = rows[np.argpartition(distances, keep - 1)[:keep]]
+    return rows
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * vectors @ centroids.T
+    return distances.argmin(axis=1).astype(np.int32)
@@ -0,0 +1,63 @@
+"""Prefill saved by reusing Ollama's context between chat turns.
+
+Usage: python bench_context.py [--model Jarvis] [--host 127.0.0.1:11434]
+
+Runs the same scripted conversation twice against a local Ollama: once
+stateless, re-sending the whole transcript every turn, and once passing the
+previous turn's context back. Prints prompt tokens evaluated and prefill
+time per turn for both.
+"""
+import argparse
+import uuid
+
+from chat_backend import OllamaChatBackend, DEFAULT_HOST, DEFAULT_MODEL
+
+TURNS = [
+    "What is the notice period for resignation?",
+    "Does it differ for employees on probation?",
+    "Can unused leave be adjusted against it?",
+    "Who approves an early release?",
+    "Summarize what you told me so far in two sentences.",
+]
+
+
+def run(backend: OllamaChatBackend, reuse_context: bool, max_tokens: int) -> list:
+    session_id = str(uuid.uuid4())
+    transcript = ""
+    stats = []
+    for turn in TURNS:
+        if reuse_context:
+            prompt = turn
+        else:
+            transcript += f"User: {turn}\n"
+            prompt = transcript
+        answer = "".join(backend.chat(session_id, prompt, reuse_context=reuse_context, num_predict=max_tokens))
+        transcript += f"Assistant: {answer}\n"
+        stats.append(backend.last_stats)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama context reuse benchmark")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    backend = OllamaChatBackend(args.model, args.host)
+    print(f"Prewarm: {backend.prewarm():.2f}s")
+
+    stateless = run(backend, reuse_context=False, max_tokens=args.max_tokens)
+    reused = run(backend, reuse_context=True, max_tokens=args.max_tokens)
+
+    print(f"{'turn':>4}  {'stateless tokens':>16} {'prefill ms':>10}  {'reuse tokens':>12} {'prefill ms':>10}")
+    for i, (a, b) in enumerate(zip(stateless, reused), 1):
+        print(f"{i:>4}  {a['prompt_tokens']:>16} {a['prefill_ms']:>10.1f}  {b['prompt_tokens']:>12} {b['prefill_ms']:>10.1f}")
+    saved = sum(a['prefill_ms'] for a in stateless) - sum(b['prefill_ms'] for b in reused)
+    print(f"Prefill saved over {len(TURNS)} turns: {saved:.1f} ms "
+          f"({saved / max(len(TURNS) - 1, 1):.1f} ms per follow-up turn)")
+    print(f"Model load time on the last turn: {reused[-1]['load_ms']:.1f} ms (keep_alive={backend.keep_alive})")
+
+
+if __name__ == "__main__":
+    main()
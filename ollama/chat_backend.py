@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+import ollama
+
+DEFAULT_HOST = "127.0.0.1:11434"
+DEFAULT_MODEL = "Jarvis"
+
+# Keep the model loaded between turns instead of Ollama's 5 minute default
+KEEP_ALIVE = "30m"
+
+# Sessions whose context token state is kept; least recently used are dropped
+MAX_SESSIONS = 256
+
+# Once a session's context outgrows the model window Ollama would truncate it
+# anyway, so the session starts over with a fresh context instead
+MAX_CONTEXT_TOKENS = 8192
+
+
+class OllamaChatBackend:
+    """Multi-turn chat on a local Ollama model without re-prefilling the conversation.
+
+    Every generate call returns `context`, the token state after the answer.
+    Passing it back with the next prompt lets Ollama continue from there, so
+    a follow-up only prefills the new prompt. `keep_alive` keeps the model
+    resident and `prewarm` loads it before the first user arrives.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, host: str = DEFAULT_HOST, keep_alive=KEEP_ALIVE,
+                 max_sessions: int = MAX_SESSIONS, max_context_tokens: int = MAX_CONTEXT_TOKENS):
+        self.client = ollama.Client(host)
+        self.model = model
+        self.keep_alive = keep_alive
+        self.max_sessions = max_sessions
+        self.max_context_tokens = max_context_tokens
+        self.contexts = OrderedDict()
+        self.lock = threading.Lock()
+        self.last_stats = None
+
+    def prewarm(self) -> float:
+        """Load the model into memory (an empty prompt only loads it); returns seconds taken"""
+        start = time.perf_counter()
+        self.client.generate(self.model, "", keep_alive=self.keep_alive)
+        return time.perf_counter() - start
+
+    def _context(self, session_id: str):
+        with self.lock:
+            context = self.contexts.get(session_id)
+            if context is not None:
+                self.contexts.move_to_end(session_id)
+            return context
+
+    def _store(self, session_id: str, context):
+        with self.lock:
+            if context and len(context) <= self.max_context_tokens:
+                self.contexts[session_id] = context
+                self.contexts.move_to_end(session_id)
+                while len(self.contexts) > self.max_sessions:
+                    self.contexts.popitem(last=False)
+            else:
+                self.contexts.pop(session_id, None)
+
+    def reset(self, session_id: str):
+        with self.lock:
+            self.contexts.pop(session_id, None)
+
+    def chat(self, session_id: str, prompt: str, reuse_context: bool = True, **options):
+        """Stream the answer to `prompt`, continuing the session's previous turns"""
+        context = self._context(session_id) if reuse_context else None
+        response = self.client.generate(
+            self.model, prompt, context=context, stream=True, keep_alive=self.keep_alive,
+            options=options or None,
+        )
+        for chunk in response:
+            if chunk.get('response'):
+                yield chunk['response']
+            if chunk.get('done'):
+                self.last_stats = turn_stats(chunk)
+                if reuse_context:
+                    self._store(session_id, chunk.get('context'))
+
+
+def turn_stats(chunk) -> dict:
+    """Token counts and timings Ollama reports on the final chunk (durations are in ns)"""
+    def ms(key):
+        return (chunk.get(key) or 0) / 1e6
+
+    return {
+        "prompt_tokens": chunk.get('prompt_eval_count') or 0,
+        "prefill_ms": ms('prompt_eval_duration'),
+        "load_ms": ms('load_duration'),
+        "output_tokens": chunk.get('eval_count') or 0,
+        "decode_ms": ms('eval_duration'),
+        "total_ms": ms('total_duration'),
+    }
@@ -1,15 +1,20 @@
-import ollama
+import uuid
+from chat_backend import OllamaChatBackend
 
-client = ollama.Client("127.0.0.1:11434")
+backend = OllamaChatBackend("Jarvis", "127.0.0.1:11434")
 
-model = "Jarvis"
+# Load the model before the first question so it does not pay the load time
+print(f"Model ready in {backend.prewarm():.2f}s")
 
+session_id = str(uuid.uuid4())
 prompt = "Who is father of world"
 
-response = client.generate(model,prompt,stream=True)
-
-for chunk in response:
-    if 'response' in chunk:
-        print(chunk['response'], end='', flush=True)
-
-print()  # Final newline
\ No newline at end of file
+# Follow-ups continue from the previous turn's context instead of re-sending the conversation
+while prompt:
+    for chunk in backend.chat(session_id, prompt):
+        print(chunk, end='', flush=True)
+    print()  # Final newline
+    try:
+        prompt = input("> ").strip()
+    except EOFError:
+        break